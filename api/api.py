@@ -4,10 +4,16 @@ from .endpoints.rd_station import router as rd_station_router
 from .endpoints.instagram import router as instagram_router
 from .endpoints.linkedin import router as linkedin_router
 from .endpoints.user import router as user_router
+from .endpoints.debug import router as debug_router
+from .endpoints.summary import router as summary_router
+from .endpoints.export import router as export_router
 
 router = APIRouter()
 router.include_router(user_router, prefix="/user", tags=["User"])
 router.include_router(instagram_router, prefix="/ig", tags=["Instagram"])
 router.include_router(linkedin_router, prefix="/ll", tags=["LinkedIn"])
 router.include_router(google_analytics_router, prefix="/ga", tags=["Google Analytics"])
-router.include_router(rd_station_router, prefix="/rd", tags=["RD Station"])
\ No newline at end of file
+router.include_router(rd_station_router, prefix="/rd", tags=["RD Station"])
+router.include_router(summary_router, prefix="/summary", tags=["Summary"])
+router.include_router(export_router, prefix="/export", tags=["Export"])
+router.include_router(debug_router, prefix="/debug", tags=["Debug"])
\ No newline at end of file
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse
+from core import profiling, resilience
+from core.auth import get_current_user_oauth
+from core.profiling import ProfiledRoute
+from models.models_user import User
+
+router = APIRouter(route_class=ProfiledRoute)
+
+def _require_admin(user: User):
+    if (user.role or "").lower() != "admin":
+        raise HTTPException(status_code=403, detail={"error":"forbidden"})
+
+@router.get("/profile")
+def list_profiles(user: User = Depends(get_current_user_oauth)):
+    _require_admin(user)
+    return {"profiles": profiling.list_profiles()}
+
+@router.get("/profile/{profile_id}")
+def get_profile(profile_id: str, format: str = Query("speedscope", description="speedscope ou collapsed"), user: User = Depends(get_current_user_oauth)):
+    _require_admin(user)
+    p = profiling.get(profile_id)
+    if not p:
+        raise HTTPException(status_code=404, detail={"error":"perfil não encontrado"})
+    sess = p["session"]
+    if format == "collapsed":
+        return PlainTextResponse(sess.collapsed())
+    if format != "speedscope":
+        raise HTTPException(status_code=400, detail={"error":"format inválido; use 'speedscope' ou 'collapsed'"})
+    return JSONResponse(
+        sess.speedscope(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'},
+    )
+
+@router.get("/upstreams")
+def upstreams(user: User = Depends(get_current_user_oauth)):
+    _require_admin(user)
+    return {"breakers": resilience.breakers_state()}
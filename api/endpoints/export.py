@@ -0,0 +1,30 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from core.auth import get_current_user_oauth
+from core.profiling import ProfiledRoute
+from models.models_user import User
+from services.export import DEFAULT_BATCH_SIZE, exportable_tables, prepare_export
+
+router = APIRouter(route_class=ProfiledRoute)
+
+@router.get("")
+def export_tables(user: User = Depends(get_current_user_oauth)):
+    return {"tables": exportable_tables()}
+
+@router.get("/{schema}/{table}")
+def export_table(
+    schema: str,
+    table: str,
+    format: str = Query("parquet", description="parquet ou arrow (Arrow IPC stream)"),
+    columns: Optional[str] = Query(None, description="Colunas separadas por vírgula (default: todas)"),
+    start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1000, le=500000, description="Linhas por lote/row group"),
+    user: User = Depends(get_current_user_oauth),
+):
+    try:
+        stream, media_type, filename = prepare_export(schema, table, columns, start_date, end_date, format, batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
+    return StreamingResponse(stream, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
@@ -1,5 +1,7 @@
 from datetime import date, timedelta
-from fastapi import APIRouter, HTTPException, Query, Depends
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, Body, Header, Request
+from fastapi.responses import StreamingResponse
 from services.google_analytics import (
     engagement_report,
     ecommerce_items_report,
@@ -10,11 +12,21 @@ from services.google_analytics import (
     content_report,
     ads_report,
     promotions_report,
+    batch_report,
+    describe_metadata,
 )
+from services.ga_stored import stored_query
+from services.ga_sync import get_state as sync_state, sync as sync_reports
+from services.ga_backfill import status as backfill_status
+from services.ga_scheduler import state as scheduler_state
+from services.ga_cache import stats as cache_stats
+from services import ga_columnar, ga_realtime
 from core.auth import get_current_user_oauth
+from core.quota import metered
+from core.profiling import ProfiledRoute
 from models.models_user import User
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 DEFAULT_START = (date.today() - timedelta(days=30)).isoformat()
 DEFAULT_END = date.today().isoformat()
@@ -27,12 +39,18 @@ def analytics_engagement(
     end_date: str = Query(DEFAULT_END),
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
+    all_rows: bool = Query(False, description="Busca todas as páginas (ignora limit/offset)"),
+    shard: Optional[str] = Query(None, description="week ou month: divide o período em fatias buscadas em paralelo (requer a dimensão date)"),
+    properties: Optional[str] = Query(None, description="IDs de properties separados por vírgula, ou all (default: GA4_PROPERTY_ID)"),
     user: User = Depends(get_current_user_oauth),
 ):
-    try:
-        return engagement_report(metrics, dimensions, start_date, end_date, limit, offset)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    with metered(user, "ga", lazy=True):
+        try:
+            return ga_columnar.json_response(engagement_report(metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard, properties))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/analytics/users")
 def analytics_users(
@@ -42,12 +60,18 @@ def analytics_users(
     end_date: str = Query(DEFAULT_END),
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
+    all_rows: bool = Query(False, description="Busca todas as páginas (ignora limit/offset)"),
+    shard: Optional[str] = Query(None, description="week ou month: divide o período em fatias buscadas em paralelo (requer a dimensão date)"),
+    properties: Optional[str] = Query(None, description="IDs de properties separados por vírgula, ou all (default: GA4_PROPERTY_ID)"),
     user: User = Depends(get_current_user_oauth),
 ):
-    try:
-        return users_report(metrics, dimensions, start_date, end_date, limit, offset)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    with metered(user, "ga", lazy=True):
+        try:
+            return ga_columnar.json_response(users_report(metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard, properties))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/analytics/events")
 def analytics_events(
@@ -57,12 +81,18 @@ def analytics_events(
     end_date: str = Query(DEFAULT_END),
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
+    all_rows: bool = Query(False, description="Busca todas as páginas (ignora limit/offset)"),
+    shard: Optional[str] = Query(None, description="week ou month: divide o período em fatias buscadas em paralelo (requer a dimensão date)"),
+    properties: Optional[str] = Query(None, description="IDs de properties separados por vírgula, ou all (default: GA4_PROPERTY_ID)"),
     user: User = Depends(get_current_user_oauth),
 ):
-    try:
-        return events_report(metrics, dimensions, start_date, end_date, limit, offset)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    with metered(user, "ga", lazy=True):
+        try:
+            return ga_columnar.json_response(events_report(metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard, properties))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/analytics/content")
 def analytics_content(
@@ -72,12 +102,18 @@ def analytics_content(
     end_date: str = Query(DEFAULT_END),
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
+    all_rows: bool = Query(False, description="Busca todas as páginas (ignora limit/offset)"),
+    shard: Optional[str] = Query(None, description="week ou month: divide o período em fatias buscadas em paralelo (requer a dimensão date)"),
+    properties: Optional[str] = Query(None, description="IDs de properties separados por vírgula, ou all (default: GA4_PROPERTY_ID)"),
     user: User = Depends(get_current_user_oauth),
 ):
-    try:
-        return content_report(metrics, dimensions, start_date, end_date, limit, offset)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    with metered(user, "ga", lazy=True):
+        try:
+            return ga_columnar.json_response(content_report(metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard, properties))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/analytics/ads")
 def analytics_ads(
@@ -87,12 +123,18 @@ def analytics_ads(
     end_date: str = Query(DEFAULT_END),
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
+    all_rows: bool = Query(False, description="Busca todas as páginas (ignora limit/offset)"),
+    shard: Optional[str] = Query(None, description="week ou month: divide o período em fatias buscadas em paralelo (requer a dimensão date)"),
+    properties: Optional[str] = Query(None, description="IDs de properties separados por vírgula, ou all (default: GA4_PROPERTY_ID)"),
     user: User = Depends(get_current_user_oauth),
 ):
-    try:
-        return ads_report(metrics, dimensions, start_date, end_date, limit, offset)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    with metered(user, "ga", lazy=True):
+        try:
+            return ga_columnar.json_response(ads_report(metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard, properties))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/analytics/promotions")
 def analytics_promotions(
@@ -102,12 +144,18 @@ def analytics_promotions(
     end_date: str = Query(DEFAULT_END),
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
+    all_rows: bool = Query(False, description="Busca todas as páginas (ignora limit/offset)"),
+    shard: Optional[str] = Query(None, description="week ou month: divide o período em fatias buscadas em paralelo (requer a dimensão date)"),
+    properties: Optional[str] = Query(None, description="IDs de properties separados por vírgula, ou all (default: GA4_PROPERTY_ID)"),
     user: User = Depends(get_current_user_oauth),
 ):
-    try:
-        return promotions_report(metrics, dimensions, start_date, end_date, limit, offset)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    with metered(user, "ga", lazy=True):
+        try:
+            return ga_columnar.json_response(promotions_report(metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard, properties))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/analytics/ecommerce/items")
 def analytics_ecommerce_items(
@@ -117,12 +165,18 @@ def analytics_ecommerce_items(
     end_date: str = Query(DEFAULT_END),
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
+    all_rows: bool = Query(False, description="Busca todas as páginas (ignora limit/offset)"),
+    shard: Optional[str] = Query(None, description="week ou month: divide o período em fatias buscadas em paralelo (requer a dimensão date)"),
+    properties: Optional[str] = Query(None, description="IDs de properties separados por vírgula, ou all (default: GA4_PROPERTY_ID)"),
     user: User = Depends(get_current_user_oauth),
 ):
-    try:
-        return ecommerce_items_report(metrics, dimensions, start_date, end_date, limit, offset)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    with metered(user, "ga", lazy=True):
+        try:
+            return ga_columnar.json_response(ecommerce_items_report(metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard, properties))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/analytics/ecommerce/revenue")
 def analytics_ecommerce_revenue(
@@ -132,12 +186,18 @@ def analytics_ecommerce_revenue(
     end_date: str = Query(DEFAULT_END),
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
+    all_rows: bool = Query(False, description="Busca todas as páginas (ignora limit/offset)"),
+    shard: Optional[str] = Query(None, description="week ou month: divide o período em fatias buscadas em paralelo (requer a dimensão date)"),
+    properties: Optional[str] = Query(None, description="IDs de properties separados por vírgula, ou all (default: GA4_PROPERTY_ID)"),
     user: User = Depends(get_current_user_oauth),
 ):
-    try:
-        return ecommerce_revenue_report(metrics, dimensions, start_date, end_date, limit, offset)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    with metered(user, "ga", lazy=True):
+        try:
+            return ga_columnar.json_response(ecommerce_revenue_report(metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard, properties))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/analytics/ecommerce/funnel")
 def analytics_ecommerce_funnel(
@@ -147,9 +207,132 @@ def analytics_ecommerce_funnel(
     end_date: str = Query(DEFAULT_END),
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
+    all_rows: bool = Query(False, description="Busca todas as páginas (ignora limit/offset)"),
+    shard: Optional[str] = Query(None, description="week ou month: divide o período em fatias buscadas em paralelo (requer a dimensão date)"),
+    properties: Optional[str] = Query(None, description="IDs de properties separados por vírgula, ou all (default: GA4_PROPERTY_ID)"),
+    user: User = Depends(get_current_user_oauth),
+):
+    with metered(user, "ga", lazy=True):
+        try:
+            return ga_columnar.json_response(ecommerce_funnel_report(metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard, properties))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/analytics/batch")
+def analytics_batch(
+    reports: List[Dict[str, Any]] = Body(..., embed=True, description="Lista de {report, metrics?, dimensions?, start_date?, end_date?, limit?, offset?, id?}"),
+    start_date: str = Body(DEFAULT_START),
+    end_date: str = Body(DEFAULT_END),
+    properties: Optional[str] = Body(None, description="IDs de properties separados por vírgula, ou all (default: GA4_PROPERTY_ID)"),
+    user: User = Depends(get_current_user_oauth),
+):
+    with metered(user, "ga"):
+        try:
+            return ga_columnar.json_response(batch_report(reports, start_date, end_date, properties))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/sync")
+def ga_sync(
+    reports: Optional[str] = Query(None, description="Relatórios separados por vírgula (default: todos)"),
+    refetch_days: Optional[int] = Query(None, ge=0, le=30, description="Dias recentes buscados de novo (default GA_SYNC_REFETCH_DAYS)"),
+    properties: Optional[str] = Query(None, description="IDs de properties separados por vírgula (default: todas as configuradas)"),
+    user: User = Depends(get_current_user_oauth),
+):
+    with metered(user, "ga"):
+        try:
+            return sync_reports(reports, refetch_days, properties)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/sync/state")
+def ga_sync_state(property_id: Optional[str] = Query(None), user: User = Depends(get_current_user_oauth)):
+    return {"state": sync_state(property_id)}
+
+@router.get("/backfill/state")
+def ga_backfill_state(properties: Optional[str] = Query(None), user: User = Depends(get_current_user_oauth)):
+    return {"state": backfill_status(properties)}
+
+@router.get("/quota")
+def ga_quota(user: User = Depends(get_current_user_oauth)):
+    return {"properties": scheduler_state()}
+
+@router.get("/cache")
+def ga_cache_stats(user: User = Depends(get_current_user_oauth)):
+    return cache_stats()
+
+@router.get("/metadata")
+def ga_metadata(
+    property_id: Optional[str] = Query(None, description="Properties separadas por vírgula, ou all (default: GA4_PROPERTY_ID)"),
     user: User = Depends(get_current_user_oauth),
 ):
     try:
-        return ecommerce_funnel_report(metrics, dimensions, start_date, end_date, limit, offset)
+        return describe_metadata(property_id)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/realtime")
+def ga_realtime_snapshots(
+    property_id: Optional[str] = Query(None, description="Property (default: GA4_PROPERTY_ID)"),
+    limit: int = Query(1, ge=1, le=1000, description="Retratos mais recentes do buffer"),
+    user: User = Depends(get_current_user_oauth),
+):
+    try:
+        return ga_columnar.json_response(ga_realtime.snapshots(property_id, limit))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/realtime/stream")
+async def ga_realtime_stream(
+    request: Request,
+    property_id: Optional[str] = Query(None, description="Property (default: GA4_PROPERTY_ID)"),
+    last_event_id: Optional[str] = Header(None),
+    user: User = Depends(get_current_user_oauth),
+):
+    try:
+        p = ga_realtime.poller(property_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        ga_realtime.sse_events(p, last_event_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/stored/{table}")
+def stored_table(
+    table: str,
+    start_date: Optional[str] = Query(None, description="Data inicial (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Data final (YYYY-MM-DD)"),
+    property_id: Optional[str] = Query(None),
+    metrics: Optional[str] = Query(None, description="Colunas de métricas separadas por vírgula (default: todas)"),
+    filter: Optional[List[str]] = Query(None, description="coluna:valor ou coluna:valor1|valor2 (repetível)"),
+    group_by: Optional[str] = Query(None, description="Dimensões para agrupar, separadas por vírgula"),
+    granularity: Optional[str] = Query(None, description="day, week ou month"),
+    limit: int = Query(1000, ge=1, le=10000),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    user: User = Depends(get_current_user_oauth),
+):
+    try:
+        return stored_query(
+            table,
+            start_date,
+            end_date,
+            property_id=property_id,
+            metrics=metrics,
+            filters=filter,
+            group_by=group_by,
+            granularity=granularity,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,25 +1,38 @@
 from fastapi import APIRouter, Query
-from services.instagram import media_list, get_profile, get_insights_profile, get_insights_posts, exchange_token_service
+from services.instagram import media_list, get_profile, get_insights_profile, get_insights_posts, exchange_token_service, stored_media
 from fastapi import Depends
 from core.auth import get_current_user_oauth
+from core.quota import metered
+from core.profiling import ProfiledRoute
 from models.models_user import User
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/profile")
 def ig_profile(fields: str = Query("id,username,name,profile_picture_url,biography,followers_count,follows_count,media_count,website"), user: User = Depends(get_current_user_oauth)):
-    return get_profile(fields=fields)
+    with metered(user, "meta"):
+        return get_profile(fields=fields)
 
 @router.get("/media")
 def ig_media(fields: str = Query("id,media_type,timestamp"), limit: int = Query(25, ge=1, le=100), media_type: str | None = None, since: int | str | None = None, until: int | str | None = None, user: User = Depends(get_current_user_oauth)):
     """
     fields: id,media_type,timestamp,caption,media_url,thumbnail_url,permalink,children{id,media_type},shortcode
     """
-    return media_list(fields=fields, limit=limit, media_type=media_type, since=since, until=until)
+    with metered(user, "meta"):
+        return media_list(fields=fields, limit=limit, media_type=media_type, since=since, until=until)
+
+@router.get("/stored/media")
+def ig_stored_media(media_type: str | None = None, since: int | str | None = None, until: int | str | None = None, order: str = Query("desc"), limit: int = Query(50, ge=1, le=1000), cursor: str | None = None, user: User = Depends(get_current_user_oauth)):
+    """
+    Mídias já persistidas em instagram.insights_posts (sem chamar a Graph API), ordenadas por timestamp.
+    Use next_cursor da resposta em cursor para a próxima página.
+    """
+    return stored_media(media_type=media_type, since=since, until=until, order=order, limit=limit, cursor=cursor)
 
 @router.get("/insights/profile")
 def ig_insights_profile(metric: str = "reach, website_clicks, profile_views, accounts_engaged, total_interactions, likes, comments, shares, saves, replies, follows_and_unfollows, profile_links_taps, views, reposts, content_views", since: int | str | None = None, until: int | str | None = None, user: User = Depends(get_current_user_oauth)):
-    return get_insights_profile(metric=metric, since=since, until=until)
+    with metered(user, "meta"):
+        return get_insights_profile(metric=metric, since=since, until=until)
 
 @router.get("/insights/posts")
 def ig_insights_posts(media_id: str = Query(...), metric: str = Query("views,reach,saved,likes,comments,shares,total_interactions,reposts"), user: User = Depends(get_current_user_oauth)):
@@ -32,7 +45,8 @@ def ig_insights_posts(media_id: str = Query(...), metric: str = Query("views,rea
 
     views, reach, saved, likes, comments, shares, total_interactions, ig_reels_video_view_total_time, ig_reels_avg_watch_time, reels_skip_rate, reposts, facebook_views, crossposted_views
     """
-    return get_insights_posts(media_id=media_id, metric=metric)
+    with metered(user, "meta"):
+        return get_insights_posts(media_id=media_id, metric=metric)
 
 @router.get("/oauth/exchange_token")
 def oauth_exchange_token(fb_exchange_token: str = Query(...), user: User = Depends(get_current_user_oauth)):
@@ -2,9 +2,10 @@ from fastapi import APIRouter, Query
 from services.linkedin import start_linkedin_bot
 from fastapi import Depends
 from core.auth import get_current_user_oauth
+from core.profiling import ProfiledRoute
 from models.models_user import User
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.post("/start")
 def linkedin_start(segments: str = Query("updates,visitors,followers,competitors"), user: User = Depends(get_current_user_oauth)):
@@ -1,9 +1,11 @@
+from typing import Optional
 from fastapi import APIRouter, Body, Depends, Query
 from fastapi.responses import RedirectResponse, HTMLResponse
 import os
 from datetime import datetime, timedelta
 
 from core.auth import get_current_user_oauth
+from core.profiling import ProfiledRoute
 from models.models_user import User
 from services.rd_station import (
     get_conversions_analytics,
@@ -12,9 +14,10 @@ from services.rd_station import (
     get_landing_pages,
     get_workflows,
     oauth_callback,
+    stored_catalog,
 )
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @router.get("/auth")
@@ -87,3 +90,17 @@ def rd_landing_pages(user: User = Depends(get_current_user_oauth)):
 def rd_workflows(user: User = Depends(get_current_user_oauth)):
     return get_workflows()
 
+
+@router.get("/stored/{kind}")
+def rd_stored_catalog(
+    kind: str,
+    name: Optional[str] = Query(None, description="Filtro por nome/título (contém)"),
+    status: Optional[str] = Query(None),
+    since: Optional[str] = Query(None, description="Data inicial (criação; envio para emails)"),
+    until: Optional[str] = Query(None),
+    order: str = Query("asc"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    user: User = Depends(get_current_user_oauth),
+):
+    return stored_catalog(kind, name, status, since, until, order, limit, cursor)
@@ -0,0 +1,27 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from core.auth import get_current_user_oauth
+from core.profiling import ProfiledRoute
+from models.models_user import User
+from services.summary import get_summary, refresh_views
+
+router = APIRouter(route_class=ProfiledRoute)
+
+@router.get("")
+def summary(
+    start_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    granularity: str = Query("day", description="day ou month (Instagram só tem dados mensais)"),
+    property_id: Optional[str] = Query(None, description="filtra os KPIs do GA por property"),
+    user: User = Depends(get_current_user_oauth),
+):
+    try:
+        return get_summary(start_date, end_date, granularity, property_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
+
+@router.post("/refresh")
+def summary_refresh(user: User = Depends(get_current_user_oauth)):
+    if (user.role or "").lower() != "admin":
+        raise HTTPException(status_code=403, detail={"error":"forbidden"})
+    return {"refreshed": refresh_views()}
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, HTTPException, Body, Depends
+from fastapi import APIRouter, HTTPException, Body, Depends, Query
 from typing import Optional
 from core.db import Base, engine, get_session
 from models.models_user import User
 from core.auth import hash_password, verify_password, create_token, get_current_user_oauth
+from core.profiling import ProfiledRoute
+from core.pagination import keyset_page
 from fastapi.security import OAuth2PasswordRequestForm
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.post("/register")
 def register(name: str = Body(...), email: str = Body(...), password: str = Body(...), role: str = Body("user")):
@@ -55,14 +57,24 @@ def me(user: User = Depends(get_current_user_oauth)):
     return {"id": user.id, "name": user.name, "email": user.email, "role": user.role}
 
 @router.get("/")
-def list_users(user: User = Depends(get_current_user_oauth)):
+def list_users(
+    role: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    user: User = Depends(get_current_user_oauth),
+):
     if (user.role or "").lower() != "admin":
         raise HTTPException(status_code=403, detail={"error":"forbidden"})
     s = get_session()
     try:
-        out = []
-        for u in s.query(User).all():
-            out.append({"id": u.id, "name": u.name, "email": u.email, "role": u.role})
-        return {"users": out}
+        q = s.query(User.id, User.name, User.email, User.role)
+        if role:
+            q = q.filter(User.role == role)
+        try:
+            rows, next_cursor = keyset_page(q, [User.id], cursor, limit, key=lambda r: [r.id])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail={"error":str(e)})
+        out = [{"id": r.id, "name": r.name, "email": r.email, "role": r.role} for r in rows]
+        return {"users": out, "next_cursor": next_cursor}
     finally:
         s.close()
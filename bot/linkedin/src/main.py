@@ -6,6 +6,9 @@ from playwright.sync_api import sync_playwright
 from .auth import create_context
 from .profile import fetch_profile_data, click_by_href, click_company_contents, click_export, click_date_range, click_date_range_custom, fill_date_range_current_month, click_update, click_export_confirm
 from .ingest import ingest_downloads
+from core import tracing
+from core.tracing import tracer
+from services.summary import refresh_views
 
 def main():
     parser = argparse.ArgumentParser()
@@ -35,25 +38,30 @@ def main():
             if comp_href:
                 base = "https://www.linkedin.com" + comp_href
                 for seg in segments:
-                    target = base + "analytics/" + seg + "/"
-                    page.goto(target)
-                    try:
-                        page.wait_for_url(re.compile(r"https://www\\.linkedin\\.com/company/\\d+/admin/analytics/" + re.escape(seg) + r"/?"), timeout=60000)
-                    except Exception:
-                        pass
-                    click_date_range(page)
-                    click_date_range_custom(page)
-                    ok, s, e = fill_date_range_current_month(page)
-                    click_update(page)
-                    click_export(page)
-                    base_name = f"linkedin_{seg}_{s.replace('/', '-')}_{e.replace('/', '-')}"
-                    click_export_confirm(page, base_name)
+                    with tracer.start_as_current_span("linkedin.bot.segment") as span:
+                        span.set_attribute("linkedin.segment", seg)
+                        target = base + "analytics/" + seg + "/"
+                        page.goto(target)
+                        try:
+                            page.wait_for_url(re.compile(r"https://www\\.linkedin\\.com/company/\\d+/admin/analytics/" + re.escape(seg) + r"/?"), timeout=60000)
+                        except Exception:
+                            pass
+                        click_date_range(page)
+                        click_date_range_custom(page)
+                        ok, s, e = fill_date_range_current_month(page)
+                        click_update(page)
+                        click_export(page)
+                        base_name = f"linkedin_{seg}_{s.replace('/', '-')}_{e.replace('/', '-')}"
+                        click_export_confirm(page, base_name)
                 try:
                     downloads_dir = os.environ.get("DOWNLOADS_DIR") or "/app/linkedin/downloads"
                 except Exception:
                     downloads_dir = "/app/linkedin/downloads"
                 try:
-                    ingest_downloads(downloads_dir)
+                    with tracer.start_as_current_span("linkedin.bot.ingest"):
+                        ingest_downloads(downloads_dir)
+                    # processo curto: atualiza o resumo aqui mesmo em vez de agendar
+                    refresh_views()
                 except Exception:
                     pass
                 if args.open_contents:
@@ -81,4 +89,10 @@ def main():
                 browser.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Continua o trace de quem iniciou o bot (TRACEPARENT no ambiente), quando houver
+    tracing.setup("linkedin-bot")
+    try:
+        with tracer.start_as_current_span("linkedin.bot.run", context=tracing.extract_env()):
+            main()
+    finally:
+        tracing.shutdown()
\ No newline at end of file
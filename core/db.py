@@ -28,3 +28,39 @@ from models import *
 
 # Criar todas as tabelas no banco de dados
 Base.metadata.create_all(bind=engine)
+
+# Chaves naturais do GA passaram a ser índices únicos: remove os índices antigos (não únicos) e, antes de criar
+# o único, as linhas duplicadas que gravações anteriores possam ter deixado (fica a de maior id)
+from models.models_google_analytics import NATURAL_KEYS as _GA_NATURAL_KEYS
+with engine.begin() as conn:
+    for _model, _cols in _GA_NATURAL_KEYS.items():
+        _tbl = _model.__tablename__
+        conn.execute(text(f'DROP INDEX IF EXISTS "google_analytics"."ix_ga_{_tbl}_natural_key"'))
+        if conn.execute(text("SELECT to_regclass(:n)"), {"n": f"google_analytics.ux_ga_{_tbl}_natural_key"}).scalar() is None:
+            _match = " AND ".join(f"coalesce(a.{c}, '') = coalesce(b.{c}, '')" for c in _cols)
+            conn.execute(text(
+                f'DELETE FROM "google_analytics"."{_tbl}" a USING "google_analytics"."{_tbl}" b '
+                f"WHERE a.id < b.id AND a.property_id = b.property_id AND a.date = b.date AND {_match}"
+            ))
+
+# A paginação de e-mails do RD passou a ordenar por coalesce(send_at, ...): o índice sobre send_at puro foi trocado
+with engine.begin() as conn:
+    conn.execute(text('DROP INDEX IF EXISTS "rd_station"."ix_rd_email_analytics_send_at"'))
+
+# create_all só cria índices junto com tabelas novas; garante os índices declarados nas tabelas já existentes
+for _table in Base.metadata.sorted_tables:
+    for _idx in _table.indexes:
+        _idx.create(bind=engine, checkfirst=True)
+
+# create_all também não altera colunas existentes; ajusta as que mudaram de tipo
+_COLUMN_TYPES = [
+    ("google_analytics", "engagement", "average_session_duration", "numeric", "numeric(18,6)"),
+]
+with engine.begin() as conn:
+    for _schema, _tbl, _col, _current, _ddl in _COLUMN_TYPES:
+        _found = conn.execute(
+            text("SELECT data_type FROM information_schema.columns WHERE table_schema = :s AND table_name = :t AND column_name = :c"),
+            {"s": _schema, "t": _tbl, "c": _col},
+        ).scalar()
+        if _found and _found != _current:
+            conn.execute(text(f'ALTER TABLE "{_schema}"."{_tbl}" ALTER COLUMN "{_col}" TYPE {_ddl}'))
@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, List, Optional, Sequence
+from sqlalchemy import tuple_
+
+def _dump(v: Any):
+    if isinstance(v, (date, datetime)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return str(v)
+    return v
+
+def _load(v: Any, expr):
+    if v is None:
+        return None
+    try:
+        pt = expr.type.python_type
+    except Exception:
+        return v
+    try:
+        if pt is datetime:
+            return datetime.fromisoformat(v)
+        if pt is date:
+            return date.fromisoformat(v)
+        if pt is Decimal:
+            return Decimal(v)
+    except Exception:
+        raise ValueError("cursor inválido")
+    return v
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_dump(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("utf-8").rstrip("=")
+
+def decode_cursor(cursor: Optional[str], exprs: Sequence) -> Optional[List[Any]]:
+    if not cursor:
+        return None
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + pad).decode("utf-8"))
+    except Exception:
+        raise ValueError("cursor inválido")
+    if not isinstance(values, list) or len(values) != len(exprs):
+        raise ValueError("cursor inválido")
+    return [_load(v, e) for v, e in zip(values, exprs)]
+
+def keyset_page(q, exprs: Sequence, cursor: Optional[str], limit: int, key: Callable[[Any], Sequence[Any]], descending: bool = False):
+    """
+    Aplica paginação por keyset (seek) sobre as expressões de ordenação.
+    As expressões devem formar uma chave única e não nula (use coalesce para colunas anuláveis);
+    `key` extrai de cada linha os valores correspondentes às expressões.
+    Retorna (linhas, next_cursor); next_cursor é None na última página.
+    """
+    after = decode_cursor(cursor, exprs)
+    if after is not None:
+        cond = tuple_(*exprs) < tuple_(*after) if descending else tuple_(*exprs) > tuple_(*after)
+        q = q.filter(cond)
+    q = q.order_by(*[e.desc() if descending else e.asc() for e in exprs])
+    rows = q.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
@@ -0,0 +1,238 @@
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from fastapi.routing import APIRoute
+
+_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+_MAX_STORED = int(os.environ.get("PROFILE_MAX_STORED") or 20)
+_profiles: "OrderedDict[str, dict]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+class ProfileSession:
+    """Amostrador de pilhas restrito às threads que executam a requisição perfilada."""
+
+    def __init__(self, name: str, interval: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.interval = interval
+        self.threads: Dict[int, int] = {}
+        self.samples: deque = deque()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    def enter_thread(self):
+        tid = threading.get_ident()
+        self.threads[tid] = self.threads.get(tid, 0) + 1
+
+    def exit_thread(self):
+        tid = threading.get_ident()
+        n = self.threads.get(tid, 0) - 1
+        if n <= 0:
+            self.threads.pop(tid, None)
+        else:
+            self.threads[tid] = n
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            tids = [t for t in list(self.threads) if t != me]
+            if not tids:
+                continue
+            frames = sys._current_frames()
+            for tid in tids:
+                f = frames.get(tid)
+                if f is None:
+                    continue
+                stack = []
+                while f is not None:
+                    co = f.f_code
+                    stack.append((co.co_name, co.co_filename, co.co_firstlineno))
+                    f = f.f_back
+                stack.reverse()
+                self.samples.append(tuple(stack))
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.id}", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def speedscope(self) -> dict:
+        frames: List[dict] = []
+        index: Dict[tuple, int] = {}
+        samples: List[List[int]] = []
+        for stack in self.samples:
+            row = []
+            for fr in stack:
+                i = index.get(fr)
+                if i is None:
+                    i = len(frames)
+                    index[fr] = i
+                    frames.append({"name": fr[0], "file": fr[1], "line": fr[2]})
+                row.append(i)
+            samples.append(row)
+        ms = self.interval * 1000.0
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(len(samples) * ms, 3),
+                "samples": samples,
+                "weights": [ms] * len(samples),
+            }],
+            "name": self.name,
+            "exporter": "qintess-marketing",
+        }
+
+    def collapsed(self) -> str:
+        # Formato "folded" (flamegraph.pl / inferno / speedscope)
+        counts: Dict[str, int] = {}
+        for stack in self.samples:
+            key = ";".join(f"{n} ({os.path.basename(fn)}:{ln})" for n, fn, ln in stack)
+            counts[key] = counts.get(key, 0) + 1
+        return "\n".join(f"{k} {v}" for k, v in counts.items())
+
+def _track(endpoint):
+    """Registra a thread que executa o endpoint na sessão ativa; custo de um ContextVar.get quando desligado."""
+    if getattr(endpoint, "_profiled", False):
+        return endpoint
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            sess = _session.get()
+            if sess is None:
+                return await endpoint(*args, **kwargs)
+            sess.enter_thread()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                sess.exit_thread()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            sess = _session.get()
+            if sess is None:
+                return endpoint(*args, **kwargs)
+            sess.enter_thread()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                sess.exit_thread()
+    wrapper._profiled = True
+    return wrapper
+
+def track(fn):
+    """Inclui no perfil ativo a thread que executar `fn` (ex.: tarefas submetidas a um executor)."""
+    return _track(fn)
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _track(endpoint), **kwargs)
+
+def start(name: str) -> ProfileSession:
+    interval = float(os.environ.get("PROFILE_INTERVAL_MS") or 1) / 1000.0
+    sess = ProfileSession(name, interval)
+    sess.start()
+    return sess
+
+def activate(sess: ProfileSession):
+    return _session.set(sess)
+
+def deactivate(token):
+    _session.reset(token)
+
+def store(sess: ProfileSession, meta: dict) -> str:
+    with _profiles_lock:
+        _profiles[sess.id] = {"session": sess, "meta": meta}
+        while len(_profiles) > _MAX_STORED:
+            _profiles.popitem(last=False)
+    return sess.id
+
+def get(profile_id: str) -> Optional[dict]:
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+def list_profiles() -> List[dict]:
+    with _profiles_lock:
+        return [dict(p["meta"], id=pid) for pid, p in reversed(_profiles.items())]
+
+def _flag(scope) -> bool:
+    for k, v in scope.get("headers") or []:
+        if k == b"x-profile":
+            return v.lower() not in (b"", b"0", b"false")
+    qs = scope.get("query_string") or b""
+    if b"profile=" not in qs:
+        return False
+    from urllib.parse import parse_qs
+    v = (parse_qs(qs.decode("latin-1")).get("profile") or [""])[0]
+    return v.lower() not in ("", "0", "false")
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for k, v in scope.get("headers") or []:
+        if k == name:
+            return v.decode("latin-1")
+    return None
+
+class ProfilerMiddleware:
+    """
+    Perfila uma requisição quando recebe `X-Profile: 1` ou `?profile=1` de um admin.
+    O perfil fica disponível em /debug/profile/{id} (id no header X-Profile-Id).
+    Sem a flag a requisição segue direto para a aplicação.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _flag(scope):
+            return await self.app(scope, receive, send)
+        from fastapi import HTTPException
+        from fastapi.concurrency import run_in_threadpool
+        from fastapi.responses import JSONResponse
+        from core.auth import get_current_user
+        try:
+            user = await run_in_threadpool(get_current_user, _header(scope, b"authorization"))
+            if (user.role or "").lower() != "admin":
+                raise HTTPException(status_code=403, detail={"error":"profiling requer role=admin"})
+        except HTTPException as e:
+            return await JSONResponse({"detail": e.detail}, status_code=e.status_code)(scope, receive, send)
+
+        sess = start(f"{scope.get('method')} {scope.get('path')}")
+        token = activate(sess)
+        meta = {"method": scope.get("method"), "path": scope.get("path"), "user_id": user.id, "created_at": time.time()}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                meta["status"] = message.get("status")
+                headers = list(message.get("headers") or [])
+                headers.append((b"x-profile-id", sess.id.encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            deactivate(token)
+            sess.stop()
+            meta["duration_ms"] = round(sess.duration * 1000, 1)
+            meta["samples"] = len(sess.samples)
+            store(sess, meta)
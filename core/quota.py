@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional
+from fastapi import HTTPException
+from sqlalchemy.dialects.postgresql import insert
+from core.db import get_session
+from models.models_quota import QuotaUsage
+
+# Capacidade compartilhada por janela de 1h: tokens GA (propertyQuota.tokensPerHour) e chamadas à Graph API
+CAPACITY_ENV = {
+    "ga": ("QUOTA_GA_TOKENS_PER_HOUR", 14000),
+    "meta": ("QUOTA_META_CALLS_PER_HOUR", 200),
+}
+
+_meter: ContextVar[Optional["Meter"]] = ContextVar("quota_meter", default=None)
+
+# Pressão reportada pelo próprio provedor (headers de uso da Meta), por processo
+_pressure: Dict[str, dict] = {}
+_pressure_lock = threading.Lock()
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name) or default)
+    except Exception:
+        return default
+
+def capacity(provider: str) -> float:
+    name, default = CAPACITY_ENV.get(provider, (None, 0))
+    return _env_float(name, default) if name else 0
+
+def _window(now: Optional[datetime] = None) -> datetime:
+    now = now or datetime.now(timezone.utc)
+    return now.replace(minute=0, second=0, microsecond=0)
+
+def _too_many(detail: dict, retry_after: int):
+    raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(max(int(retry_after), 1))})
+
+# Leitura de quota_usage por provedor reaproveitada por QUOTA_USAGE_TTL segundos. Os custos que este processo
+# grava depois da leitura (Meter.flush) entram por cima até a próxima leitura, que já os traz do banco
+_usage_cache: Dict[str, dict] = {}
+_usage_lock = threading.Lock()
+
+def _read_usage(provider: str, window: datetime) -> Dict[int, int]:
+    s = get_session()
+    try:
+        rows = s.query(QuotaUsage.user_id, QuotaUsage.cost).filter(
+            QuotaUsage.provider == provider,
+            QuotaUsage.window_start == window,
+        ).all()
+        return {uid: int(cost or 0) for uid, cost in rows}
+    finally:
+        s.close()
+
+def usage(provider: str) -> Dict[int, int]:
+    window = _window()
+    ttl = _env_float("QUOTA_USAGE_TTL", 5)
+    with _usage_lock:
+        c = _usage_cache.get(provider)
+        if c is None or c["window"] != window or time.monotonic() - c["read_at"] >= ttl:
+            read_at = time.monotonic()
+            used = _read_usage(provider, window)
+            # gravações locais anteriores à leitura já estão em `used`
+            local = [x for x in c["local"] if x[0] > read_at] if c and c["window"] == window else []
+            c = _usage_cache[provider] = {"window": window, "read_at": read_at, "used": used, "local": local}
+        out = dict(c["used"])
+        for _, uid, cost in c["local"]:
+            out[uid] = out.get(uid, 0) + cost
+    return out
+
+def _record_local(provider: str, window: datetime, user_id: int, cost: int):
+    with _usage_lock:
+        c = _usage_cache.get(provider)
+        if c is not None and c["window"] == window:
+            c["local"].append((time.monotonic(), user_id, cost))
+
+def check(user_id: int, provider: str):
+    """
+    Recusa com 429 quando o provedor sinaliza saturação ou quando o usuário já gastou
+    sua fatia justa da janela atual: max(capacidade * QUOTA_MIN_SHARE, capacidade / usuários ativos).
+    Usuários ativos e consumo vêm de usage(), sem consulta ao banco a cada requisição.
+    """
+    now = time.time()
+    with _pressure_lock:
+        p = _pressure.get(provider)
+    if p and p["pct"] >= _env_float("QUOTA_USAGE_CEILING", 90) and now < p["until"]:
+        _too_many({"error": f"cota do app no provedor {provider} quase esgotada", "usage_pct": p["pct"]}, p["until"] - now)
+    cap = capacity(provider)
+    if cap <= 0:
+        return
+    used = usage(provider)
+    active = len(set(used) | {user_id})
+    share = max(cap * _env_float("QUOTA_MIN_SHARE", 0.1), cap / active)
+    mine = used.get(user_id, 0)
+    if mine >= share:
+        window_end = _window() + timedelta(hours=1)
+        retry = (window_end - datetime.now(timezone.utc)).total_seconds()
+        _too_many({"error": f"cota de {provider} do usuário esgotada nesta hora", "used": mine, "share": int(share), "active_users": active}, retry)
+
+class Meter:
+    def __init__(self, user_id: int, deferred: Optional[str] = None):
+        self.user_id = user_id
+        self.costs: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        # provedor cuja verificação de fatia fica para a primeira chamada upstream (metered(lazy=True))
+        self.deferred = deferred
+
+    def gate(self, provider: str):
+        if self.deferred != provider:
+            return
+        check(self.user_id, provider)
+        self.deferred = None
+
+    def add(self, provider: str, cost: float):
+        with self._lock:
+            c = self.costs.setdefault(provider, [0, 0])
+            c[0] += int(cost or 0)
+            c[1] += 1
+
+    def flush(self):
+        if not self.costs:
+            return
+        window = _window()
+        s = get_session()
+        try:
+            for provider, (cost, calls) in self.costs.items():
+                stmt = insert(QuotaUsage).values(user_id=self.user_id, provider=provider, window_start=window, cost=cost, calls=calls)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[QuotaUsage.user_id, QuotaUsage.provider, QuotaUsage.window_start],
+                    set_={"cost": QuotaUsage.cost + cost, "calls": QuotaUsage.calls + calls, "updated_at": datetime.now(timezone.utc)},
+                )
+                s.execute(stmt)
+            s.commit()
+            for provider, (cost, _) in self.costs.items():
+                _record_local(provider, window, self.user_id, cost)
+        except Exception as e:
+            s.rollback()
+            print(f"Erro ao registrar consumo de cota: {e}")
+        finally:
+            s.close()
+
+@contextmanager
+def metered(user, provider: str, lazy: bool = False):
+    """
+    Verifica a fatia do usuário no provedor e contabiliza o custo upstream gerado dentro do bloco.
+    Com lazy=True a verificação só acontece na primeira chamada upstream (`gate`), então respostas
+    servidas inteiramente de cache não são barradas nem cobradas.
+    """
+    if not lazy:
+        check(user.id, provider)
+    meter = Meter(user.id, provider if lazy else None)
+    token = _meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _meter.reset(token)
+        meter.flush()
+
+def gate(provider: str):
+    """Chamado logo antes de uma chamada upstream; aplica a verificação adiada por metered(lazy=True)."""
+    m = _meter.get()
+    if m is not None:
+        m.gate(provider)
+
+def charge(provider: str, cost: float):
+    m = _meter.get()
+    if m is not None:
+        m.add(provider, cost)
+
+def _max_pct(entry: dict) -> float:
+    vals = [entry.get(k) for k in ("call_count", "total_cputime", "total_time")]
+    return max([float(v) for v in vals if v is not None] or [0.0])
+
+def record_meta_usage(headers):
+    """Lê X-App-Usage e X-Business-Use-Case-Usage (percentuais 0-100) das respostas da Graph API."""
+    pct = 0.0
+    regain_min = 0.0
+    try:
+        raw = headers.get("x-app-usage")
+        if raw:
+            pct = max(pct, _max_pct(json.loads(raw)))
+        raw = headers.get("x-business-use-case-usage")
+        if raw:
+            for entries in json.loads(raw).values():
+                for e in entries or []:
+                    pct = max(pct, _max_pct(e))
+                    regain_min = max(regain_min, float(e.get("estimated_time_to_regain_access") or 0))
+    except Exception:
+        return
+    hold = regain_min * 60 if regain_min else 300
+    with _pressure_lock:
+        _pressure["meta"] = {"pct": pct, "until": time.time() + hold}
@@ -0,0 +1,275 @@
+import contextvars
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Callable, Dict, Optional
+import requests
+from fastapi import HTTPException
+
+# Defaults por provedor; cada valor pode ser sobrescrito por UPSTREAM_<PROVEDOR>_<NOME> (ex.: UPSTREAM_META_TIMEOUT)
+DEFAULTS = {
+    "timeout": 20.0,        # orçamento total de latência por chamada (s)
+    "slow_ms": 8000.0,      # acima disso a chamada conta como lenta
+    "error_rate": 0.5,      # fração de falhas na janela que abre o circuito
+    "slow_rate": 0.8,       # fração de chamadas lentas na janela que abre o circuito
+    "window": 20,           # últimas N chamadas consideradas
+    "min_calls": 10,        # mínimo de chamadas na janela antes de avaliar
+    "open_seconds": 30.0,   # tempo aberto antes de liberar uma sonda (half-open)
+    "stale_max_age": 86400.0,
+    "workers": 8,           # threads do provedor (bulkhead): um provedor lento não ocupa as do outro
+}
+
+_STALE_MAX_ENTRIES = int(os.environ.get("UPSTREAM_STALE_MAX_ENTRIES") or 500)
+
+def _cfg(provider: str, name: str) -> float:
+    raw = os.environ.get(f"UPSTREAM_{provider.upper()}_{name.upper()}")
+    try:
+        return float(raw) if raw else float(DEFAULTS[name])
+    except Exception:
+        return float(DEFAULTS[name])
+
+# Ficha de uma chamada admitida com o circuito fechado (as sondas recebem uma ficha própria)
+_ADMITTED = object()
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        # ficha da sonda em voo no half-open; só o resultado dela decide o estado
+        self.probing: Optional[object] = None
+        self.calls: deque = deque(maxlen=int(_cfg(provider, "window")))
+        self._lock = threading.Lock()
+
+    def allow(self) -> Optional[object]:
+        """Ficha para passar a `record`, ou None se a chamada deve falhar rápido."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return _ADMITTED
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= _cfg(self.provider, "open_seconds"):
+                self.state = self.HALF_OPEN
+                self.probing = None
+            if self.state == self.HALF_OPEN and self.probing is None:
+                # uma única sonda por vez; as demais falham rápido até ela voltar
+                self.probing = object()
+                return self.probing
+            return None
+
+    def retry_after(self) -> int:
+        left = _cfg(self.provider, "open_seconds") - (time.monotonic() - self.opened_at)
+        return max(int(left), 1)
+
+    def record(self, ok: bool, elapsed: float, token: object = _ADMITTED):
+        slow = elapsed * 1000 >= _cfg(self.provider, "slow_ms")
+        with self._lock:
+            if self.state == self.HALF_OPEN and token is self.probing:
+                self.probing = None
+                if ok and not slow:
+                    self.state = self.CLOSED
+                    self.calls.clear()
+                else:
+                    self._open()
+                return
+            if self.state != self.CLOSED:
+                # admitida antes de o circuito abrir e terminando depois: não decide mais nada
+                return
+            self.calls.append((ok, slow, elapsed))
+            n = len(self.calls)
+            if n < _cfg(self.provider, "min_calls"):
+                return
+            errors = sum(1 for c in self.calls if not c[0]) / n
+            slows = sum(1 for c in self.calls if c[1]) / n
+            if errors >= _cfg(self.provider, "error_rate") or slows >= _cfg(self.provider, "slow_rate"):
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.calls.clear()
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            lat = sorted(c[2] for c in self.calls if c[0])
+        if len(lat) < 5:
+            return None
+        return lat[min(int(len(lat) * q), len(lat) - 1)]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            n = len(self.calls)
+            return {
+                "state": self.state,
+                "calls": n,
+                "error_rate": round(sum(1 for c in self.calls if not c[0]) / n, 3) if n else 0.0,
+                "slow_rate": round(sum(1 for c in self.calls if c[1]) / n, 3) if n else 0.0,
+            }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def breaker(provider: str) -> CircuitBreaker:
+    b = _breakers.get(provider)
+    if b is None:
+        with _breakers_lock:
+            b = _breakers.setdefault(provider, CircuitBreaker(provider))
+    return b
+
+def breakers_state() -> Dict[str, dict]:
+    return {p: b.snapshot() for p, b in list(_breakers.items())}
+
+# Última resposta boa por (provedor, url, params sem credenciais), usada enquanto o circuito está aberto
+_stale: "OrderedDict[tuple, tuple]" = OrderedDict()
+_stale_lock = threading.Lock()
+
+def _stale_key(provider: str, url: str, params: Optional[dict]) -> tuple:
+    items = tuple(sorted((k, str(v)) for k, v in (params or {}).items() if k not in ("access_token", "client_secret")))
+    return (provider, url, items)
+
+def _stale_put(key: tuple, resp: requests.Response):
+    with _stale_lock:
+        _stale[key] = (time.time(), resp)
+        _stale.move_to_end(key)
+        while len(_stale) > _STALE_MAX_ENTRIES:
+            _stale.popitem(last=False)
+
+def _stale_get(provider: str, key: tuple) -> Optional[requests.Response]:
+    with _stale_lock:
+        hit = _stale.get(key)
+    if not hit or time.time() - hit[0] > _cfg(provider, "stale_max_age"):
+        return None
+    resp = copy.copy(hit[1])
+    resp.stale = True
+    resp.cached_at = hit[0]
+    return resp
+
+_pools: Dict[str, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+def _pool(provider: str) -> ThreadPoolExecutor:
+    p = _pools.get(provider)
+    if p is None:
+        with _pools_lock:
+            p = _pools.get(provider)
+            if p is None:
+                p = _pools[provider] = ThreadPoolExecutor(max_workers=int(_cfg(provider, "workers")), thread_name_prefix=f"upstream-{provider}")
+    return p
+
+def _retryable(resp: requests.Response) -> bool:
+    return resp.status_code >= 500 or resp.status_code == 429
+
+def _fetch(url: str, params: Optional[dict], headers: Optional[dict], deadline: float) -> requests.Response:
+    """
+    GET lendo o corpo à medida que chega: o timeout do requests vale por operação de socket, então o prazo total
+    é conferido a cada pedaço recebido e a thread é liberada mesmo com um servidor que envia aos poucos.
+    """
+    left = deadline - time.monotonic()
+    resp = requests.get(url, params=params, headers=headers, timeout=max(left, 0.001), stream=True)
+    try:
+        body = []
+        # read1 devolve o que já chegou (urllib3 2.x), sem esperar completar o tamanho pedido
+        read = getattr(resp.raw, "read1", None) or resp.raw.read
+        while True:
+            chunk = read(65536, decode_content=True)
+            if not chunk:
+                break
+            if time.monotonic() > deadline:
+                raise requests.Timeout("prazo total esgotado durante a leitura da resposta")
+            body.append(chunk)
+        resp._content = b"".join(body)
+        resp._content_consumed = True
+    finally:
+        resp.close()
+    return resp
+
+def _with_deadline(provider: str, send, budget: float) -> requests.Response:
+    f = _pool(provider).submit(contextvars.copy_context().run, send)
+    try:
+        return f.result(timeout=budget)
+    except FutureTimeout:
+        raise requests.Timeout(f"orçamento de {budget:.1f}s esgotado")
+
+def _hedged(provider: str, send, budget: float, hedge_after: float) -> requests.Response:
+    """Dispara uma segunda tentativa se a primeira passar de `hedge_after`; vence a primeira resposta boa."""
+    ctx = contextvars.copy_context()
+    start = time.monotonic()
+    pool = _pool(provider)
+    pending = {pool.submit(ctx.copy().run, send)}
+    hedged = False
+    last_resp, last_exc = None, None
+    while pending:
+        left = budget - (time.monotonic() - start)
+        if left <= 0:
+            break
+        done, pending = wait(pending, timeout=min(left, hedge_after) if not hedged else left, return_when=FIRST_COMPLETED)
+        for f in done:
+            try:
+                r = f.result()
+            except Exception as e:
+                last_exc = e
+                continue
+            if not _retryable(r):
+                return r
+            last_resp = r
+        if not hedged:
+            hedged = True
+            pending.add(pool.submit(ctx.copy().run, send))
+    if last_resp is not None:
+        return last_resp
+    raise last_exc or requests.Timeout(f"orçamento de {budget:.1f}s esgotado")
+
+def get(provider: str, url: str, params: Optional[dict] = None, headers: Optional[dict] = None, hedge: bool = False,
+        on_attempt: Optional[Callable[[], None]] = None) -> requests.Response:
+    """
+    GET protegido por circuit breaker do provedor, executado no pool de threads do próprio provedor.
+    - Circuito aberto: devolve a última resposta boa da mesma chamada (resp.stale = True) ou 503 imediato.
+    - `hedge=True`: leituras sensíveis à latência ganham uma segunda tentativa após o p95 observado.
+    - `on_attempt`: chamado a cada requisição realmente enviada (inclusive a tentativa hedge), para contabilizar cota.
+    Falhas de rede sem cache viram 504/502; respostas HTTP são devolvidas para o chamador tratar.
+    """
+    b = breaker(provider)
+    key = _stale_key(provider, url, params)
+    token = b.allow()
+    if token is None:
+        stale = _stale_get(provider, key)
+        if stale is not None:
+            return stale
+        raise HTTPException(
+            status_code=503,
+            detail={"error": f"{provider} indisponível no momento (circuit breaker aberto)"},
+            headers={"Retry-After": str(b.retry_after())},
+        )
+    budget = _cfg(provider, "timeout")
+    t0 = time.monotonic()
+
+    def send() -> requests.Response:
+        if on_attempt:
+            on_attempt()
+        return _fetch(url, params, headers, t0 + budget)
+
+    try:
+        if hedge:
+            p95 = b.latency_quantile(0.95)
+            resp = _hedged(provider, send, budget, p95 if p95 is not None else budget / 3)
+        else:
+            resp = _with_deadline(provider, send, budget)
+    except Exception as e:
+        b.record(False, time.monotonic() - t0, token)
+        stale = _stale_get(provider, key)
+        if stale is not None:
+            return stale
+        status = 504 if isinstance(e, requests.Timeout) else 502
+        raise HTTPException(status_code=status, detail={"error": f"falha ao chamar {provider}: {e}"})
+    ok = not _retryable(resp)
+    b.record(ok, time.monotonic() - t0, token)
+    if resp.status_code < 400:
+        _stale_put(key, resp)
+    elif not ok:
+        stale = _stale_get(provider, key)
+        if stale is not None:
+            return stale
+    return resp
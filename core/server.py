@@ -0,0 +1,59 @@
+import os
+from typing import Callable, List
+from gunicorn.app.base import BaseApplication
+
+_worker_hooks: List[Callable[[], None]] = []
+
+def on_worker_start(fn: Callable[[], None]) -> Callable[[], None]:
+    """Registra uma função executada em cada worker logo após o fork."""
+    _worker_hooks.append(fn)
+    return fn
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name) or default)
+    except Exception:
+        return default
+
+def _post_fork(server, worker):
+    # Com preload_app o pool do SQLAlchemy foi criado no master; conexões não podem ser compartilhadas entre processos
+    from core.db import engine
+    engine.dispose(close=False)
+    for fn in _worker_hooks:
+        try:
+            fn()
+        except Exception as e:
+            worker.log.warning(f"hook de inicialização do worker falhou: {e}")
+
+class Application(BaseApplication):
+    def __init__(self, app_uri: str, options: dict):
+        self.app_uri = app_uri
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for k, v in self.options.items():
+            if k in self.cfg.settings and v is not None:
+                self.cfg.set(k, v)
+
+    def load(self):
+        from gunicorn.util import import_app
+        return import_app(self.app_uri)
+
+def options_from_env(port: int, workers: int) -> dict:
+    return {
+        "bind": f"0.0.0.0:{port}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": (os.environ.get("PRELOAD_APP") or "true").lower() != "false",
+        "max_requests": _env_int("MAX_REQUESTS", 1000),
+        "max_requests_jitter": _env_int("MAX_REQUESTS_JITTER", 100),
+        "timeout": _env_int("WORKER_TIMEOUT", 120),
+        "graceful_timeout": _env_int("GRACEFUL_TIMEOUT", 30),
+        "keepalive": _env_int("KEEPALIVE", 5),
+        "loglevel": "info",
+        "post_fork": _post_fork,
+    }
+
+def run(app_uri: str, port: int, workers: int):
+    Application(app_uri, options_from_env(port, workers)).run()
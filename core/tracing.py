@@ -0,0 +1,73 @@
+import functools
+import os
+from typing import Dict, Optional
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+tracer = trace.get_tracer("qintess-marketing")
+
+_provider: Optional[TracerProvider] = None
+
+def _exporter():
+    # OTLP/HTTP quando há coletor configurado; senão, JSON por linha em arquivo (OTEL_TRACES_FILE)
+    if os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT") or os.environ.get("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"):
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    path = os.environ.get("OTEL_TRACES_FILE")
+    if path:
+        out = open(path, "a", encoding="utf-8")
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    return None
+
+def setup(service_name: str, app=None) -> bool:
+    """
+    Configura o provider global e instrumenta FastAPI/SQLAlchemy.
+    Sem coletor nem arquivo configurado nada é instalado e os spans manuais viram no-op.
+    """
+    global _provider
+    if _provider is not None:
+        return True
+    exporter = _exporter()
+    if exporter is None:
+        return False
+    _provider = TracerProvider(resource=Resource.create({"service.name": os.environ.get("OTEL_SERVICE_NAME") or service_name}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+    from core.db import engine
+    SQLAlchemyInstrumentor().instrument(engine=engine, tracer_provider=_provider)
+    if app is not None:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+        FastAPIInstrumentor.instrument_app(app, tracer_provider=_provider, excluded_urls="ready")
+    return True
+
+def shutdown():
+    if _provider is not None:
+        _provider.shutdown()
+
+def traced(name: str):
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def inject_env(env: Dict[str, str]) -> Dict[str, str]:
+    """Propaga o contexto atual para um subprocesso via TRACEPARENT/TRACESTATE."""
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    for k, v in carrier.items():
+        env[k.upper()] = v
+    return env
+
+def extract_env():
+    carrier = {}
+    for k in ("traceparent", "tracestate"):
+        v = os.environ.get(k.upper())
+        if v:
+            carrier[k] = v
+    return propagate.extract(carrier)
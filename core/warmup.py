@@ -0,0 +1,60 @@
+import time
+from typing import Callable, Dict, List, Tuple
+from sqlalchemy import text
+from core.db import engine
+
+state: Dict = {"ready": False, "started_at": None, "finished_at": None, "steps": {}}
+
+def _warm_db():
+    # Abre conexões até o tamanho do pool para que as primeiras requisições não paguem o handshake
+    conns = []
+    try:
+        for _ in range(getattr(engine.pool, "size", lambda: 1)()):
+            c = engine.connect()
+            c.execute(text("SELECT 1"))
+            conns.append(c)
+    finally:
+        for c in conns:
+            c.close()
+
+def _ensure_summary_views():
+    from services.summary import ensure_views
+    ensure_views()
+
+def _warm_ga():
+    from services.google_analytics import warm_up
+    warm_up()
+
+def _warm_instagram():
+    from services.instagram import warm_up
+    warm_up()
+
+def _warm_rd():
+    from services.rd_station import warm_up
+    warm_up()
+
+# (nome, função, obrigatório para ficar pronto)
+STEPS: List[Tuple[str, Callable[[], None], bool]] = [
+    ("db", _warm_db, True),
+    ("summary_views", _ensure_summary_views, False),
+    ("ga_client", _warm_ga, False),
+    ("meta_token", _warm_instagram, False),
+    ("rd_token", _warm_rd, False),
+]
+
+def warm_up() -> Dict:
+    state["ready"] = False
+    state["started_at"] = time.time()
+    ok = True
+    for name, fn, required in STEPS:
+        t0 = time.perf_counter()
+        try:
+            fn()
+            state["steps"][name] = {"ok": True, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+        except Exception as e:
+            state["steps"][name] = {"ok": False, "ms": round((time.perf_counter() - t0) * 1000, 1), "error": str(e)}
+            if required:
+                ok = False
+    state["finished_at"] = time.time()
+    state["ready"] = ok
+    return state
@@ -1,18 +1,42 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from api.api import router as api_router
 from core.db import Base, engine
+from core.profiling import ProfilerMiddleware
+from core import tracing
+from core.warmup import state as warmup_state, warm_up
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Roda em cada worker antes de aceitar tráfego: cliente GA, pool do banco e caches de token
+    await run_in_threadpool(warm_up)
+    yield
 
 app = FastAPI(
     title="Qintess Marketing API",
     version="1.0",
-    description="API para gerenciar e monitorar o desempenho da empresa nas midias sociais."
+    description="API para gerenciar e monitorar o desempenho da empresa nas midias sociais.",
+    lifespan=lifespan,
 )
 app.include_router(api_router)
+app.add_middleware(ProfilerMiddleware)
+tracing.setup("qintess-marketing-api", app)
+
+@app.get("/ready", include_in_schema=False)
+def ready():
+    return JSONResponse(status_code=200 if warmup_state["ready"] else 503, content=warmup_state)
 
 def main():
     import os
     import uvicorn
     port = int(os.environ.get("PORT") or 8000)
+    workers = int(os.environ.get("WEB_CONCURRENCY") or 1)
+    if workers > 1:
+        from core.server import run
+        run("main:app", port, workers)
+        return
     uvicorn.run("main:app", host="0.0.0.0", port=port, log_level="info")
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 from .models_user import User
+from .models_quota import QuotaUsage
 from .models_rd_station import (
     RDToken,
     RDEmailAnalytics,
@@ -14,7 +15,10 @@ from .models_google_analytics import (
     GAContent,
     GAEcommerce,
     GAAds,
-    GAPromotions
+    GAPromotions,
+    GASyncState,
+    GABackfillShard,
+    GARealtimeSnapshot
 )
 from .models_instagram import (
     InsightsProfile,
@@ -30,6 +34,7 @@ from .models_linkedin import (
 
 __all__ = [
     "User",
+    "QuotaUsage",
     "RDToken",
     "RDEmailAnalytics",
     "RDConversionAnalytics",
@@ -43,6 +48,9 @@ __all__ = [
     "GAEcommerce",
     "GAAds",
     "GAPromotions",
+    "GASyncState",
+    "GABackfillShard",
+    "GARealtimeSnapshot",
     "InsightsProfile",
     "InsightsPost",
     "OAuthToken",
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, Text, Numeric, Date
+from sqlalchemy import Column, Integer, BigInteger, Text, Numeric, Date, Index, literal_column
 from sqlalchemy.types import DateTime
 from sqlalchemy.sql import func
 from core.db import Base
@@ -33,7 +33,7 @@ class GAEngagement(Base):
     country = Column(Text)
     engaged_sessions = Column(BigInteger)
     engagement_rate = Column(Numeric(10,6))
-    average_session_duration = Column(Integer)
+    average_session_duration = Column(Numeric(18,6))
     user_engagement_duration = Column(Integer)
     events_per_session = Column(Numeric(10,6))
     session_key_event_rate = Column(Numeric(10,6))
@@ -156,3 +156,58 @@ class GAPromotions(Base):
     items_clicked_in_list = Column(BigInteger)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+class GASyncState(Base):
+    __tablename__ = "sync_state"
+    __table_args__ = {"schema": "google_analytics"}
+    property_id = Column(Text, primary_key=True)
+    report = Column(Text, primary_key=True)
+    watermark = Column(Date, nullable=False)
+    last_start_date = Column(Date)
+    last_row_count = Column(BigInteger)
+    last_run_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+class GABackfillShard(Base):
+    __tablename__ = "backfill_shards"
+    __table_args__ = {"schema": "google_analytics"}
+    property_id = Column(Text, primary_key=True)
+    report = Column(Text, primary_key=True)
+    start_date = Column(Date, primary_key=True)
+    end_date = Column(Date, primary_key=True)
+    status = Column(Text, nullable=False)
+    row_count = Column(BigInteger)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    error = Column(Text)
+    completed_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+class GARealtimeSnapshot(Base):
+    __tablename__ = "realtime_snapshots"
+    __table_args__ = {"schema": "google_analytics"}
+    property_id = Column(Text, primary_key=True)
+    seq = Column(BigInteger, primary_key=True)
+    at = Column(DateTime(timezone=True), nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+# Chave natural de cada tabela de relatório (além de property_id e date). Índice único por expressão:
+# colunas-chave nulas (ex.: item_* nas linhas por canal de GAEcommerce) entram como '' e ainda conflitam,
+# o que permite gravar com INSERT ... ON CONFLICT DO UPDATE
+NATURAL_KEYS = {
+    GAUsers: ("country", "device_category"),
+    GAEngagement: ("device_category", "country"),
+    GAEvents: ("event_name", "page_path"),
+    GAContent: ("page_title", "page_path"),
+    GAEcommerce: ("item_id", "item_name", "item_category", "session_default_channel_group"),
+    GAAds: ("campaign_name", "campaign_id"),
+    GAPromotions: ("session_default_channel_group",),
+}
+
+def natural_key(model_cls) -> list:
+    return [model_cls.property_id, model_cls.date, *(func.coalesce(getattr(model_cls, c), literal_column("''")) for c in NATURAL_KEYS[model_cls])]
+
+for _model in NATURAL_KEYS:
+    Index(f"ux_ga_{_model.__tablename__}_natural_key", *natural_key(_model), unique=True)
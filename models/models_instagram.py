@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, Text, Float
+from sqlalchemy import Column, Integer, BigInteger, Text, Float, Index
 from sqlalchemy.sql import func
 from sqlalchemy.types import DateTime
 from core.db import Base
@@ -32,7 +32,11 @@ class InsightsProfile(Base):
 
 class InsightsPost(Base):
     __tablename__ = "insights_posts"
-    __table_args__ = {"schema": "instagram"}
+    __table_args__ = (
+        Index("ix_ig_insights_posts_timestamp", "timestamp", "media_id"),
+        Index("ix_ig_insights_posts_type_timestamp", "media_type", "timestamp", "media_id"),
+        {"schema": "instagram"},
+    )
 
     media_id = Column(Text, primary_key=True)
     media_type = Column(Text, nullable=False)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, BigInteger, Text
+from sqlalchemy.types import DateTime
+from sqlalchemy.sql import func
+from core.db import Base
+
+class QuotaUsage(Base):
+    __tablename__ = "quota_usage"
+    __table_args__ = {"schema": "user"}
+
+    user_id = Column(Integer, primary_key=True)
+    provider = Column(Text, primary_key=True)
+    window_start = Column(DateTime(timezone=True), primary_key=True)
+    cost = Column(BigInteger, nullable=False, default=0)
+    calls = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Text, DateTime, Integer, Float, BigInteger, Boolean
+from sqlalchemy import Column, Text, DateTime, Integer, Float, BigInteger, Boolean, Index, literal_column
 from sqlalchemy.sql import func
 from core.db import Base
 
@@ -36,6 +36,11 @@ class RDEmailAnalytics(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
+# Chave de paginação dos e-mails: send_at nulo vira uma data anterior a qualquer envio real.
+# O índice é sobre a mesma expressão usada no ORDER BY/seek, senão o Postgres não o aproveita.
+SEND_AT_KEY = func.coalesce(RDEmailAnalytics.send_at, literal_column("CAST('0001-01-01 00:00:00+00' AS TIMESTAMP WITH TIME ZONE)"))
+Index("ix_rd_email_analytics_send_at_key", SEND_AT_KEY, RDEmailAnalytics.campaign_id)
+
 class RDConversionAnalytics(Base):
     __tablename__ = "conversion_analytics"
     __table_args__ = {"schema": "rd_station"}
@@ -0,0 +1,59 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.analytics.data_v1beta import BetaAnalyticsDataClient
+from google.analytics.data_v1beta.types import DateRange, Metric, RunReportRequest
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100.0 * len(values))) - 1))
+    return values[k]
+
+def _request(property_id: str) -> RunReportRequest:
+    return RunReportRequest(
+        property=f"properties/{property_id}",
+        metrics=[Metric(name="activeUsers")],
+        date_ranges=[DateRange(start_date="7daysAgo", end_date="today")],
+    )
+
+def _run(label: str, call, n: int, idle: float):
+    lat = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        call()
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        time.sleep(idle)
+    print(f"{label:<8} n={n} p50={_percentile(lat, 50):.1f}ms p95={_percentile(lat, 95):.1f}ms mean={statistics.mean(lat):.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência do runReport: cliente novo por chamada vs pool compartilhado")
+    parser.add_argument("--property", default=os.getenv("GA4_PROPERTY_ID"))
+    parser.add_argument("-n", type=int, default=30)
+    parser.add_argument("--idle", type=float, default=0.0, help="pausa entre chamadas (s), para observar o efeito do keepalive")
+    args = parser.parse_args()
+    if not args.property:
+        parser.error("informe --property ou GA4_PROPERTY_ID")
+
+    from services.google_analytics import _client_pool
+    req = _request(args.property)
+
+    def fresh():
+        # comportamento anterior: cliente, canal e credenciais novos a cada chamada
+        BetaAnalyticsDataClient().run_report(req)
+
+    def pooled():
+        _client_pool.get().run_report(req)
+
+    _client_pool.warm()
+    _run("fresh", fresh, args.n, args.idle)
+    _run("pooled", pooled, args.n, args.idle)
+
+if __name__ == "__main__":
+    main()
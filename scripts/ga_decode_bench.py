@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.analytics.data_v1beta.types import (
+    DimensionHeader, MetricHeader, MetricType, RunReportResponse,
+)
+from services.ga_columnar import decode, records_json
+
+DIMS = ["date", "eventName", "pagePath"]
+METRICS = [
+    ("eventCount", MetricType.TYPE_INTEGER),
+    ("eventCountPerUser", MetricType.TYPE_FLOAT),
+    ("eventValue", MetricType.TYPE_FLOAT),
+    ("keyEvents", MetricType.TYPE_INTEGER),
+    ("totalUsers", MetricType.TYPE_INTEGER),
+    ("userEngagementDuration", MetricType.TYPE_SECONDS),
+    ("engagementRate", MetricType.TYPE_FLOAT),
+    ("purchaseRevenue", MetricType.TYPE_CURRENCY),
+]
+
+def _response(n: int) -> RunReportResponse:
+    pb = RunReportResponse.pb(RunReportResponse(
+        dimension_headers=[DimensionHeader(name=d) for d in DIMS],
+        metric_headers=[MetricHeader(name=m, type_=t) for m, t in METRICS],
+        row_count=n,
+    ))
+    for i in range(n):
+        r = pb.rows.add()
+        for v in (f"2024{1 + i % 12:02d}{1 + i % 28:02d}", f"event_{i % 50}", f"/page/{i % 997}"):
+            r.dimension_values.add(value=v)
+        for j in range(len(METRICS)):
+            r.metric_values.add(value=str(i * (j + 1)) if METRICS[j][1] == MetricType.TYPE_INTEGER else f"{i * 0.37 + j:.4f}")
+    return RunReportResponse.wrap(pb)
+
+def legacy(response):
+    # implementação anterior: um dict por linha, células como texto, via wrappers proto-plus
+    metrics = [m for m, _ in METRICS]
+    out = []
+    for row in response.rows:
+        record = {}
+        for i, dim in enumerate(DIMS):
+            record[dim] = row.dimension_values[i].value
+        for j, metric in enumerate(metrics):
+            record[metric] = row.metric_values[j].value
+        out.append(record)
+    return out
+
+def columnar(response):
+    return decode(response, [m for m, _ in METRICS], DIMS)
+
+def legacy_json(response):
+    return json.dumps(legacy(response))
+
+def columnar_json(response):
+    # caminho atual da resposta: Arrow -> JSON direto das colunas
+    return records_json(columnar(response))
+
+def _measure(label, fn, response):
+    # CPU (melhor de 3) e memória medidos em execuções separadas: o tracemalloc distorce o tempo
+    cpu = float("inf")
+    for _ in range(3):
+        t0 = time.process_time()
+        fn(response)
+        cpu = min(cpu, time.process_time() - t0)
+    tracemalloc.start()
+    result = fn(response)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    extra = f" arrow_bytes={result.nbytes / 1e6:.1f}MB" if hasattr(result, "nbytes") else ""
+    print(f"{label:<14} cpu={cpu * 1000:8.1f}ms peak_alloc={peak / 1e6:8.1f}MB{extra}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Decodificação de RunReportResponse: por linha (texto) vs colunar (Arrow)")
+    parser.add_argument("-n", type=int, default=200000, help="linhas sintéticas")
+    args = parser.parse_args()
+    response = _response(args.n)
+    print(f"rows={args.n} dims={len(DIMS)} metrics={len(METRICS)}")
+    _measure("legacy", legacy, response)
+    _measure("columnar", columnar, response)
+    _measure("legacy+json", legacy_json, response)
+    _measure("columnar+json", columnar_json, response)
+
+if __name__ == "__main__":
+    main()
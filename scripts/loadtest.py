@@ -0,0 +1,59 @@
+import argparse
+import statistics
+import threading
+import time
+import requests
+
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100.0 * len(values))) - 1))
+    return values[k]
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga simples (threads + requests) com latências p50/p95/p99")
+    parser.add_argument("url")
+    parser.add_argument("--token", help="JWT para o header Authorization")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="segundos")
+    parser.add_argument("--method", default="GET")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def worker():
+        s = requests.Session()
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                r = s.request(args.method, args.url, headers=headers, timeout=120)
+                ok = r.status_code < 400
+            except Exception:
+                ok = False
+            dt = (time.perf_counter() - t0) * 1000.0
+            with lock:
+                if ok:
+                    latencies.append(dt)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"url={args.url} concurrency={args.concurrency} duration={elapsed:.1f}s")
+    print(f"requests={len(latencies)} errors={errors[0]} rps={len(latencies) / elapsed:.1f}")
+    if latencies:
+        print(f"p50={_percentile(latencies, 50):.1f}ms p95={_percentile(latencies, 95):.1f}ms p99={_percentile(latencies, 99):.1f}ms mean={statistics.mean(latencies):.1f}ms")
+
+if __name__ == "__main__":
+    main()
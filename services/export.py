@@ -0,0 +1,161 @@
+from datetime import date as _date, timedelta
+from typing import Iterator, List, Optional, Tuple
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Float, Integer, Numeric, Table, select
+from core.db import Base, engine
+from services.google_analytics import _split_csv
+
+# Schemas/tabelas com credenciais ou dados de usuários não são exportáveis
+_BLOCKED_SCHEMAS = {"user"}
+_BLOCKED_TABLES = {"instagram.oauth_token", "rd_station.rd_tokens"}
+
+# Coluna usada no filtro start_date/end_date, na ordem de preferência
+_DATE_COLUMNS = ("date", "send_at", "timestamp")
+
+FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+DEFAULT_BATCH_SIZE = 50000
+
+def exportable_tables() -> List[str]:
+    return sorted(
+        key for key, t in Base.metadata.tables.items()
+        if t.schema not in _BLOCKED_SCHEMAS and key not in _BLOCKED_TABLES
+    )
+
+def _table(schema: str, table: str) -> Table:
+    key = f"{schema}.{table}"
+    t = Base.metadata.tables.get(key)
+    if t is None or schema in _BLOCKED_SCHEMAS or key in _BLOCKED_TABLES:
+        raise ValueError(f"tabela desconhecida: {key}. Disponíveis: {exportable_tables()}")
+    return t
+
+def _arrow_type(col_type) -> pa.DataType:
+    if isinstance(col_type, (BigInteger, Integer)):
+        return pa.int64()
+    if isinstance(col_type, Float):
+        return pa.float64()
+    if isinstance(col_type, Numeric):
+        if col_type.precision:
+            return pa.decimal128(col_type.precision, col_type.scale or 0)
+        return pa.float64()
+    if isinstance(col_type, Boolean):
+        return pa.bool_()
+    if isinstance(col_type, DateTime):
+        return pa.timestamp("us", tz="UTC") if col_type.timezone else pa.timestamp("us")
+    if isinstance(col_type, Date):
+        return pa.date32()
+    return pa.string()
+
+def _date_column(t: Table):
+    for name in _DATE_COLUMNS:
+        if name in t.c:
+            return t.c[name]
+    return None
+
+class _Sink:
+    """Destino write-only para os writers do pyarrow; os bytes são drenados a cada lote."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        b = bytes(data)
+        self.chunks.append(b)
+        self.pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        out = b"".join(self.chunks)
+        self.chunks.clear()
+        return out
+
+def prepare_export(
+    schema: str,
+    table: str,
+    columns: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    fmt: str = "parquet",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Tuple[Iterator[bytes], str, str]:
+    """
+    Valida a requisição e devolve (gerador de bytes, media type, nome do arquivo).
+    A leitura usa cursor server-side e lotes de `batch_size` linhas, então a memória não cresce com a tabela.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"formato inválido: {fmt}. Use {list(FORMATS)}")
+    t = _table(schema, table)
+    names = _split_csv(columns) if columns else []
+    if names:
+        bad = [n for n in names if n not in t.c]
+        if bad:
+            raise ValueError(f"colunas inválidas: {bad}. Disponíveis: {[c.name for c in t.columns]}")
+        cols = [t.c[n] for n in names]
+    else:
+        cols = list(t.columns)
+
+    q = select(*cols)
+    if start_date or end_date:
+        dcol = _date_column(t)
+        if dcol is None:
+            raise ValueError(f"{schema}.{table} não tem coluna de data para filtrar")
+        try:
+            if start_date:
+                q = q.where(dcol >= _date.fromisoformat(start_date))
+            if end_date:
+                # inclusivo também para colunas datetime
+                q = q.where(dcol < _date.fromisoformat(end_date) + timedelta(days=1))
+        except ValueError:
+            raise ValueError("datas devem estar em YYYY-MM-DD")
+    pk = list(t.primary_key.columns)
+    if pk:
+        q = q.order_by(*pk)
+
+    arrow_schema = pa.schema([pa.field(c.name, _arrow_type(c.type)) for c in cols])
+    media_type, ext = FORMATS[fmt]
+    return _stream(q, arrow_schema, fmt, batch_size), media_type, f"{schema}.{table}.{ext}"
+
+def _stream(q, arrow_schema: pa.Schema, fmt: str, batch_size: int) -> Iterator[bytes]:
+    sink = _Sink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, arrow_schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, arrow_schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+    n = len(arrow_schema)
+    with engine.connect().execution_options(stream_results=True, yield_per=batch_size) as conn:
+        result = conn.execute(q)
+        for rows in result.partitions(batch_size):
+            arrays = [
+                pa.array([r[i] for r in rows], type=arrow_schema.field(i).type)
+                for i in range(n)
+            ]
+            batch = pa.RecordBatch.from_arrays(arrays, schema=arrow_schema)
+            if fmt == "parquet":
+                writer.write_batch(batch, row_group_size=batch_size)
+            else:
+                writer.write_batch(batch)
+            out = sink.drain()
+            if out:
+                yield out
+    writer.close()
+    out = sink.drain()
+    if out:
+        yield out
@@ -0,0 +1,149 @@
+import argparse
+import sys
+from datetime import date as _date, datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from core.db import get_session
+from models.models_google_analytics import GABackfillShard
+from services import ga_scheduler
+from services.ga_sync import _defaults
+from services.summary import refresh_views
+from services.google_analytics import SHARDS, GA4Service, _date_shards, _get_service, _property_list, _resolve_date, _split_csv, _submit, _background_executor
+
+def _done(property_id: str, report: str) -> set:
+    s = get_session()
+    try:
+        rows = s.query(GABackfillShard.start_date, GABackfillShard.end_date).filter(
+            GABackfillShard.property_id == property_id,
+            GABackfillShard.report == report,
+            GABackfillShard.status == "done",
+        ).all()
+        return {(a.isoformat(), b.isoformat()) for a, b in rows}
+    finally:
+        s.close()
+
+def _checkpoint(property_id: str, report: str, start: str, end: str, status: str, row_count: Optional[int] = None, error: Optional[str] = None):
+    now = datetime.now(timezone.utc)
+    values = {
+        "status": status,
+        "row_count": row_count,
+        "error": error,
+        "completed_at": now if status == "done" else None,
+    }
+    stmt = insert(GABackfillShard).values(
+        property_id=property_id, report=report,
+        start_date=_date.fromisoformat(start), end_date=_date.fromisoformat(end),
+        attempts=1, **values,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GABackfillShard.property_id, GABackfillShard.report, GABackfillShard.start_date, GABackfillShard.end_date],
+        set_=dict(values, attempts=GABackfillShard.attempts + 1, updated_at=now),
+    )
+    s = get_session()
+    try:
+        s.execute(stmt)
+        s.commit()
+    finally:
+        s.close()
+
+def _run_shard(svc: GA4Service, report: str, start: str, end: str) -> int:
+    d = _defaults(report)
+    result = getattr(svc, f"{report}_report")(
+        list(d["metrics"]), list(d["dimensions"]), start, end, GA4Service.PAGE_SIZE, 0, True,
+    )
+    return int(result.get("row_count") or 0)
+
+def plan(reports: List[str], properties: List[str], start_date: str, end_date: str, shard: str) -> List[Tuple[str, str, str, str]]:
+    """(property, relatório, início, fim) ainda não concluídos, em ordem de data."""
+    shards = _date_shards(start_date, end_date, shard)
+    todo = []
+    for pid in properties:
+        for report in reports:
+            done = _done(pid, report)
+            todo += [(pid, report, a, b) for a, b in shards if (a, b) not in done]
+    return todo
+
+def backfill(start_date: str, end_date: str, reports: Optional[str] = None, properties: Optional[str] = None, shard: str = "month") -> dict:
+    """
+    Percorre relatórios × properties × fatias de data, gravando cada fatia concluída em
+    google_analytics.backfill_shards. Uma nova execução com os mesmos parâmetros pula o que já terminou.
+    Roda na faixa `backfill` do agendador: usa a cota que sobra acima da reserva das demais faixas.
+    """
+    names = _split_csv(reports) if reports else list(GA4Service.REPORTS)
+    bad = [n for n in names if n not in GA4Service.REPORTS]
+    if bad:
+        raise ValueError(f"relatórios desconhecidos: {bad}. Disponíveis: {list(GA4Service.REPORTS)}")
+    pids = _property_list(properties or "all")
+    todo = plan(names, pids, start_date, end_date, shard)
+    print(f"backfill: {len(todo)} fatias pendentes ({len(pids)} properties x {len(names)} relatórios, {shard})")
+
+    def run(pid: str, report: str, start: str, end: str) -> int:
+        try:
+            rows = _run_shard(_get_service(pid), report, start, end)
+        except Exception as e:
+            _checkpoint(pid, report, start, end, "failed", error=str(e)[:2000])
+            raise
+        _checkpoint(pid, report, start, end, "done", row_count=rows)
+        return rows
+
+    with ga_scheduler.lane("backfill"):
+        futures = [(t, _submit(run, *t, executor=_background_executor)) for t in todo]
+    ok, failed, rows = 0, 0, 0
+    for i, ((pid, report, start, end), f) in enumerate(futures, 1):
+        try:
+            n = f.result()
+            ok += 1
+            rows += n
+            print(f"[{i}/{len(futures)}] {pid} {report} {start}..{end}: {n} linhas")
+        except Exception as e:
+            failed += 1
+            print(f"[{i}/{len(futures)}] {pid} {report} {start}..{end}: falhou ({e})")
+    return {"shards": len(todo), "done": ok, "failed": failed, "rows": rows}
+
+def status(properties: Optional[str] = None) -> List[dict]:
+    s = get_session()
+    try:
+        q = s.query(
+            GABackfillShard.property_id, GABackfillShard.report, GABackfillShard.status,
+            func.count(), func.min(GABackfillShard.start_date), func.max(GABackfillShard.end_date), func.sum(GABackfillShard.row_count),
+        )
+        if properties:
+            q = q.filter(GABackfillShard.property_id.in_(_property_list(properties)))
+        q = q.group_by(GABackfillShard.property_id, GABackfillShard.report, GABackfillShard.status)
+        return [
+            {"property_id": p, "report": r, "status": st, "shards": n, "from": a, "to": b, "rows": int(rows or 0)}
+            for p, r, st, n, a, b, rows in q.order_by(GABackfillShard.property_id, GABackfillShard.report).all()
+        ]
+    finally:
+        s.close()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m services.ga_backfill", description="carga histórica retomável por fatias de data")
+    parser.add_argument("--start", help="data inicial (YYYY-MM-DD), obrigatória exceto com --status")
+    parser.add_argument("--end", help="data final (default: ontem)", default="yesterday")
+    parser.add_argument("--reports", help="relatórios separados por vírgula (default: todos)")
+    parser.add_argument("--properties", help="properties separadas por vírgula (default: todas as configuradas)")
+    parser.add_argument("--shard", choices=SHARDS, default="month")
+    parser.add_argument("--status", action="store_true", help="só mostra o progresso gravado")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        for row in status(args.properties):
+            print(f"{row['property_id']} {row['report']:<18} {row['status']:<6} {row['shards']:>4} fatias  {row['from']}..{row['to']}  {row['rows']} linhas")
+        return 0
+    if not args.start:
+        parser.error("informe --start")
+    start, end = _resolve_date(args.start).isoformat(), _resolve_date(args.end).isoformat()
+    result = backfill(start, end, args.reports, args.properties, args.shard)
+    print(f"backfill: {result['done']} fatias concluídas, {result['failed']} com falha, {result['rows']} linhas")
+    if result["failed"]:
+        print("execute novamente o mesmo comando para repetir só as fatias que faltam")
+    try:
+        refresh_views()
+    except Exception as e:
+        print(f"Erro ao atualizar views de resumo: {e}")
+    return 1 if result["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date as _date, timedelta
+from typing import List, Optional, Tuple
+import pyarrow as pa
+
+# Dados do GA com mais de ~72h não mudam mais; só esses intervalos vão para o cache
+SETTLED_DAYS = int(os.getenv("GA_CACHE_SETTLED_DAYS") or 3)
+CACHE_DIR = os.getenv("GA_CACHE_DIR") or os.path.join(os.getcwd(), ".cache", "ga")
+MAX_BYTES = int(float(os.getenv("GA_CACHE_MAX_MB") or 512) * 1024 * 1024)
+
+_lock = threading.Lock()
+_local = threading.local()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+def enabled() -> bool:
+    return MAX_BYTES > 0
+
+def settled(end_date: _date, today: Optional[_date] = None) -> bool:
+    today = today or _date.today()
+    return end_date < today - timedelta(days=SETTLED_DAYS)
+
+def key(property_id: str, metrics: List[str], dimensions: List[str], start_date: _date, end_date: _date, limit: int, offset: int) -> str:
+    # Datas já resolvidas (ISO), para "30daysAgo" e "2025-01-01" caírem na mesma chave quando equivalentes
+    raw = json.dumps([property_id, list(metrics), list(dimensions), start_date.isoformat(), end_date.isoformat(), limit, offset])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def _conn() -> sqlite3.Connection:
+    # Uma conexão por thread; o arquivo é compartilhado entre os workers do gunicorn (WAL)
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(CACHE_DIR, "reports.sqlite3"), timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, property_id TEXT, start_date TEXT, end_date TEXT,"
+            " body BLOB NOT NULL, total_rows INTEGER, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed_at)")
+        _local.conn = conn
+    return conn
+
+def _encode(table: pa.Table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression="zstd")) as w:
+        w.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def _decode(body: bytes) -> pa.Table:
+    return pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+
+def get(cache_key: str) -> Optional[Tuple[pa.Table, int]]:
+    """(tabela, total_rows) gravados para a chave, ou None."""
+    if not enabled():
+        return None
+    try:
+        conn = _conn()
+        row = conn.execute("SELECT body, total_rows FROM entries WHERE key = ?", (cache_key,)).fetchone()
+        if row is None:
+            with _lock:
+                _stats["misses"] += 1
+            return None
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), cache_key))
+        table = _decode(row[0])
+    except Exception as e:
+        print(f"Erro ao ler cache GA: {e}")
+        return None
+    with _lock:
+        _stats["hits"] += 1
+    return table, int(row[1] or 0)
+
+def put(cache_key: str, property_id: str, start_date: _date, end_date: _date, table: pa.Table, total_rows: int):
+    if not enabled():
+        return
+    try:
+        body = _encode(table)
+        if len(body) > MAX_BYTES:
+            return
+        now = time.time()
+        conn = _conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, property_id, start_date, end_date, body, total_rows, size, created_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (cache_key, property_id, start_date.isoformat(), end_date.isoformat(), body, total_rows, len(body), now, now),
+        )
+        with _lock:
+            _stats["stores"] += 1
+        _evict(conn)
+    except Exception as e:
+        print(f"Erro ao gravar cache GA: {e}")
+
+def _evict(conn: sqlite3.Connection):
+    # LRU por tamanho: remove as entradas acessadas há mais tempo até caber em GA_CACHE_MAX_MB
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    removed = 0
+    for k, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+        if total <= MAX_BYTES:
+            break
+        conn.execute("DELETE FROM entries WHERE key = ?", (k,))
+        total -= size
+        removed += 1
+    with _lock:
+        _stats["evictions"] += removed
+
+def stats() -> dict:
+    out = {"enabled": enabled(), "dir": CACHE_DIR, "max_bytes": MAX_BYTES, "settled_days": SETTLED_DAYS}
+    if enabled():
+        try:
+            n, size = _conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            out.update(entries=n, bytes=size)
+        except Exception as e:
+            out["error"] = str(e)
+    with _lock:
+        out.update(_stats)
+    return out
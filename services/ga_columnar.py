@@ -0,0 +1,82 @@
+import json
+from typing import Any, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from fastapi import Response
+from google.analytics.data_v1beta.types import MetricType, RunRealtimeReportResponse, RunReportResponse
+
+# Métricas inteiras viram int64; as demais (float, moeda, segundos, ...) float64
+_INTEGER_TYPES = {MetricType.TYPE_INTEGER}
+
+def metric_arrow_type(metric_type) -> pa.DataType:
+    return pa.int64() if metric_type in _INTEGER_TYPES else pa.float64()
+
+def _numeric(raw: pa.Array, typ: pa.DataType) -> pa.Array:
+    # Conversão texto -> número feita pelo Arrow (C++), com "" tratado como nulo
+    raw = pc.if_else(pc.equal(raw, ""), pa.scalar(None, pa.string()), raw)
+    try:
+        return pc.cast(raw, typ)
+    except pa.ArrowInvalid:
+        return pc.cast(raw, pa.float64())
+
+def decode(response, metrics: List[str], dimensions: Optional[List[str]]) -> pa.Table:
+    """
+    Converte um RunReportResponse (ou RunRealtimeReportResponse) em uma tabela Arrow tipada (uma coluna por dimensão/métrica).
+    Percorre a mensagem protobuf crua, sem os wrappers proto-plus de cada célula.
+    """
+    pb = type(response).pb(response) if isinstance(response, (RunReportResponse, RunRealtimeReportResponse)) else response
+    rows = pb.rows
+    headers = list(pb.metric_headers)
+    cols = {}
+    for i, d in enumerate(dimensions or []):
+        cols[d] = pa.array([r.dimension_values[i].value for r in rows], pa.string())
+    for j, m in enumerate(metrics):
+        typ = metric_arrow_type(headers[j].type_ if j < len(headers) else None)
+        cols[m] = _numeric(pa.array([r.metric_values[j].value for r in rows], pa.string()), typ)
+    return pa.table(cols)
+
+def concat(tables: List[pa.Table]) -> pa.Table:
+    # páginas/fatias do mesmo relatório; "permissive" cobre uma métrica que caiu em float64 numa página só
+    return tables[0] if len(tables) == 1 else pa.concat_tables(tables, promote_options="permissive")
+
+def merge(tables: List[pa.Table], dimensions: List[str]) -> pa.Table:
+    """Junta lotes de métricas (até 10 por requisição) pela chave de dimensões, via hash join do Arrow."""
+    out = tables[0]
+    for t in tables[1:]:
+        if not dimensions:
+            # sem dimensões cada lote é uma única linha de totais
+            for name in t.column_names:
+                out = out.append_column(name, t.column(name))
+            continue
+        out = out.join(t, keys=dimensions, join_type="full outer")
+    return out
+
+def parse_dates(column) -> pa.Array:
+    # "YYYYMMDD" (Data API) ou "YYYY-MM-DD" -> date32; valores inválidos viram nulo
+    compact = pc.strptime(column, format="%Y%m%d", unit="s", error_is_null=True)
+    iso = pc.strptime(column, format="%Y-%m-%d", unit="s", error_is_null=True)
+    return pc.coalesce(compact, iso).cast(pa.date32())
+
+def _pandas_type(typ: pa.DataType):
+    # inteiros com nulo continuam inteiros no JSON (sem virar 1.0)
+    return pd.Int64Dtype() if pa.types.is_integer(typ) else None
+
+def records_json(table: pa.Table) -> str:
+    """Linhas da tabela como array JSON de objetos, serializado direto das colunas (sem um dict Python por linha)."""
+    if table.num_rows == 0:
+        return "[]"
+    return table.to_pandas(types_mapper=_pandas_type).to_json(orient="records", double_precision=15, date_format="iso")
+
+def dumps(obj: Any) -> str:
+    """json.dumps para os resultados do GA: tabelas Arrow em qualquer nível viram listas de objetos."""
+    if isinstance(obj, pa.Table):
+        return records_json(obj)
+    if isinstance(obj, dict):
+        return "{" + ",".join(f"{json.dumps(str(k))}:{dumps(v)}" for k, v in obj.items()) + "}"
+    if isinstance(obj, (list, tuple)):
+        return "[" + ",".join(dumps(v) for v in obj) + "]"
+    return json.dumps(obj, default=str)
+
+def json_response(obj: Any) -> Response:
+    return Response(content=dumps(obj), media_type="application/json")
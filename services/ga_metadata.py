@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from google.analytics.data_v1beta.types import CheckCompatibilityRequest, Compatibility, Dimension, GetMetadataRequest, Metric
+
+# getMetadata muda raramente (novas definições personalizadas); é recarregado em segundo plano após o TTL
+METADATA_TTL = float(os.getenv("GA_METADATA_TTL") or 6 * 3600)
+COMPAT_TTL = float(os.getenv("GA_COMPAT_TTL") or 24 * 3600)
+COMPAT_MAX_ENTRIES = int(os.getenv("GA_COMPAT_MAX_ENTRIES") or 2000)
+# checkCompatibility segue o mesmo limite de métricas do runReport
+_METRICS_PER_CHECK = 10
+
+class PropertyMetadata:
+    def __init__(self, property_id: str, response):
+        self.property_id = property_id
+        self.loaded_at = time.time()
+        self.dimensions = {d.api_name: d for d in response.dimensions}
+        self.metrics = {m.api_name: m for m in response.metrics}
+        # nomes antigos continuam aceitos pela API
+        for d in response.dimensions:
+            for old in d.deprecated_api_names:
+                self.dimensions.setdefault(old, d)
+        for m in response.metrics:
+            for old in m.deprecated_api_names:
+                self.metrics.setdefault(old, m)
+
+    def summary(self) -> dict:
+        return {
+            "property_id": self.property_id,
+            "loaded_at": self.loaded_at,
+            "dimensions": len(self.dimensions),
+            "metrics": len(self.metrics),
+            "custom_dimensions": sorted(k for k, d in self.dimensions.items() if d.custom_definition),
+            "custom_metrics": sorted(k for k, m in self.metrics.items() if m.custom_definition),
+        }
+
+_metadata: Dict[str, PropertyMetadata] = {}
+_refreshing: set = set()
+_compat: "OrderedDict[Tuple, Tuple[float, List[str]]]" = OrderedDict()
+_lock = threading.Lock()
+
+def _load(client, property_id: str) -> PropertyMetadata:
+    response = client.get_metadata(GetMetadataRequest(name=f"properties/{property_id}/metadata"))
+    meta = PropertyMetadata(property_id, response)
+    with _lock:
+        _metadata[property_id] = meta
+    return meta
+
+def _refresh_async(client, property_id: str):
+    with _lock:
+        if property_id in _refreshing:
+            return
+        _refreshing.add(property_id)
+
+    def run():
+        try:
+            _load(client, property_id)
+        except Exception as e:
+            print(f"Erro ao atualizar metadata GA ({property_id}): {e}")
+        finally:
+            with _lock:
+                _refreshing.discard(property_id)
+
+    threading.Thread(target=run, name=f"ga-metadata-{property_id}", daemon=True).start()
+
+def metadata(client, property_id: str) -> PropertyMetadata:
+    """Metadata da property; a primeira leitura é síncrona, depois do TTL a cópia antiga segue servindo enquanto recarrega."""
+    meta = _metadata.get(property_id)
+    if meta is None:
+        return _load(client, property_id)
+    if time.time() - meta.loaded_at > METADATA_TTL:
+        _refresh_async(client, property_id)
+    return meta
+
+def _incompatible(client, property_id: str, metrics: List[str], dimensions: List[str]) -> List[str]:
+    key = (property_id, tuple(sorted(metrics)), tuple(sorted(dimensions)))
+    now = time.time()
+    with _lock:
+        hit = _compat.get(key)
+        if hit and now - hit[0] <= COMPAT_TTL:
+            _compat.move_to_end(key)
+            return hit[1]
+    response = client.check_compatibility(CheckCompatibilityRequest(
+        property=f"properties/{property_id}",
+        metrics=[Metric(name=m) for m in metrics],
+        dimensions=[Dimension(name=d) for d in dimensions],
+    ))
+    bad = [c.dimension_metadata.api_name for c in response.dimension_compatibilities if c.compatibility == Compatibility.INCOMPATIBLE]
+    bad += [c.metric_metadata.api_name for c in response.metric_compatibilities if c.compatibility == Compatibility.INCOMPATIBLE]
+    with _lock:
+        _compat[key] = (now, bad)
+        _compat.move_to_end(key)
+        while len(_compat) > COMPAT_MAX_ENTRIES:
+            _compat.popitem(last=False)
+    return bad
+
+def validate(client, property_id: str, metrics: List[str], dimensions: Optional[List[str]]):
+    """
+    Confere nomes contra o getMetadata da property (inclui dimensões/métricas personalizadas) e a combinação
+    contra checkCompatibility, ambos em cache. Sem metadata disponível a validação fica a cargo do próprio GA.
+    """
+    dimensions = dimensions or []
+    try:
+        meta = metadata(client, property_id)
+    except Exception as e:
+        print(f"Metadata GA indisponível ({property_id}), validação local ignorada: {e}")
+        return
+    unknown_d = [d for d in dimensions if d not in meta.dimensions]
+    unknown_m = [m for m in metrics if m not in meta.metrics]
+    if unknown_d or unknown_m:
+        raise ValueError(f"desconhecidos na property {property_id}: dimensões {unknown_d}, métricas {unknown_m}. Consulte /ga/metadata")
+    bad: List[str] = []
+    try:
+        for i in range(0, max(len(metrics), 1), _METRICS_PER_CHECK):
+            bad += [x for x in _incompatible(client, property_id, metrics[i:i + _METRICS_PER_CHECK], dimensions) if x not in bad]
+    except Exception as e:
+        print(f"checkCompatibility GA falhou ({property_id}), validação local ignorada: {e}")
+        return
+    if bad:
+        raise ValueError(f"combinação incompatível de métricas/dimensões: {bad}")
+
+def describe(client, property_id: str) -> dict:
+    meta = metadata(client, property_id)
+    with _lock:
+        compat_entries = sum(1 for k in _compat if k[0] == property_id)
+    return dict(
+        meta.summary(),
+        compat_cache_entries=compat_entries,
+        dimension_names=sorted(meta.dimensions),
+        metric_names=sorted(meta.metrics),
+    )
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import pyarrow.compute as pc
+from google.analytics.data_v1beta.types import Dimension, Metric, RunRealtimeReportRequest
+from sqlalchemy import func, text
+from core.db import engine, get_session
+from core.tracing import tracer
+from models.models_google_analytics import GARealtimeSnapshot
+from services import ga_columnar, ga_scheduler
+from services.google_analytics import _client_pool, _property_list, _split_csv
+
+# Intervalo entre consultas ao runRealtimeReport e quantos retratos ficam guardados por property
+INTERVAL = float(os.getenv("GA_REALTIME_INTERVAL") or 30)
+BUFFER_SIZE = int(os.getenv("GA_REALTIME_BUFFER") or 120)
+# Sem nenhum leitor por este tempo o poller para (nenhum token gasto sem dashboard aberto)
+IDLE_SECONDS = float(os.getenv("GA_REALTIME_IDLE") or 120)
+METRICS = _split_csv(os.getenv("GA_REALTIME_METRICS") or "activeUsers")
+DIMENSIONS = _split_csv(os.getenv("GA_REALTIME_DIMENSIONS") or "deviceCategory")
+HEARTBEAT_SECONDS = 15
+
+# Chave do advisory lock que elege, por property, o único worker que consulta o GA
+_LEADER_LOCK_KEY = 7340022
+
+class RealtimePoller:
+    """
+    Retratos do runRealtimeReport de uma property, compartilhados entre workers pela tabela
+    google_analytics.realtime_snapshots (seq e buffer são os mesmos em todos os processos).
+    Cada worker com leitores roda uma thread; só a que detém o advisory lock da property consulta o GA,
+    as demais apenas espelham a tabela. O custo no GA depende só do intervalo, não de workers ou leitores.
+    """
+
+    def __init__(self, property_id: str):
+        self.property_id = property_id
+        # (seq, payload JSON) espelhados da tabela
+        self.buffer: deque = deque(maxlen=BUFFER_SIZE)
+        self.last_error: Optional[str] = None
+        self.last_demand = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # conexão que segura o advisory lock enquanto este worker é o líder
+        self._leader = None
+        self._next_poll = 0.0
+        self._next_election = 0.0
+
+    def touch(self):
+        """Registra demanda e inicia o poller se estiver parado."""
+        with self._lock:
+            self.last_demand = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"ga-realtime-{self.property_id}", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                now = time.monotonic()
+                if self._leader is None and now >= self._next_election:
+                    self._next_election = now + INTERVAL
+                    self._elect()
+                if self._leader is not None and now >= self._next_poll:
+                    self._next_poll = now + INTERVAL
+                    self._poll()
+                self.sync()
+            except Exception as e:
+                print(f"Erro no poller realtime do GA ({self.property_id}): {e}")
+            with self._lock:
+                if time.monotonic() - self.last_demand > IDLE_SECONDS:
+                    self._resign()
+                    self._thread = None
+                    return
+            time.sleep(1.0)
+
+    def _elect(self):
+        conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            got = conn.execute(
+                text("SELECT pg_try_advisory_lock(:k, hashtext(:p))"), {"k": _LEADER_LOCK_KEY, "p": self.property_id}
+            ).scalar()
+        except Exception:
+            conn.close()
+            raise
+        if got:
+            self._leader = conn
+            self._next_poll = 0.0
+        else:
+            conn.close()
+
+    def _resign(self):
+        conn, self._leader = self._leader, None
+        if conn is None:
+            return
+        try:
+            conn.execute(text("SELECT pg_advisory_unlock(:k, hashtext(:p))"), {"k": _LEADER_LOCK_KEY, "p": self.property_id})
+        except Exception:
+            pass
+        finally:
+            conn.close()
+
+    def _poll(self):
+        try:
+            # conexão do lock caiu: outro worker pode ter assumido
+            self._leader.execute(text("SELECT 1"))
+        except Exception:
+            self._resign()
+            return
+        request = RunRealtimeReportRequest(
+            property=f"properties/{self.property_id}",
+            metrics=[Metric(name=m) for m in METRICS],
+            dimensions=[Dimension(name=d) for d in DIMENSIONS],
+        )
+        try:
+            with tracer.start_as_current_span("ga.run_realtime_report") as span:
+                span.set_attribute("ga.property_id", self.property_id)
+                # passa pelo escalonador da property, atrás das consultas interativas
+                with ga_scheduler.lane("sync"), ga_scheduler.slot(self.property_id):
+                    response = _client_pool.get().run_realtime_report(request)
+                span.set_attribute("ga.row_count", len(response.rows))
+            table = ga_columnar.decode(response, METRICS, DIMENSIONS)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Erro no poller realtime do GA ({self.property_id}): {e}")
+            return
+        at = datetime.now(timezone.utc)
+        s = get_session()
+        try:
+            model = GARealtimeSnapshot
+            seq = (s.query(func.max(model.seq)).filter(model.property_id == self.property_id).scalar() or 0) + 1
+            snap = {
+                "seq": seq,
+                "property_id": self.property_id,
+                "at": at.isoformat(),
+                "metrics": METRICS,
+                "dimensions": DIMENSIONS,
+                "totals": {m: pc.sum(table[m]).as_py() for m in METRICS},
+                "rows": table,
+            }
+            s.add(model(property_id=self.property_id, seq=seq, at=at, payload=ga_columnar.dumps(snap)))
+            s.query(model).filter(model.property_id == self.property_id, model.seq <= seq - BUFFER_SIZE).delete(synchronize_session=False)
+            s.commit()
+        except Exception:
+            s.rollback()
+            raise
+        finally:
+            s.close()
+        self.last_error = None
+
+    def sync(self):
+        """Traz para o buffer local os retratos gravados (por qualquer worker) desde o último espelhado."""
+        with self._sync_lock:
+            with self._lock:
+                last = self.buffer[-1][0] if self.buffer else 0
+            model = GARealtimeSnapshot
+            s = get_session()
+            try:
+                rows = (
+                    s.query(model.seq, model.payload)
+                    .filter(model.property_id == self.property_id, model.seq > last)
+                    .order_by(model.seq.desc())
+                    .limit(BUFFER_SIZE)
+                    .all()
+                )
+            finally:
+                s.close()
+            with self._lock:
+                self.buffer.extend((r.seq, r.payload) for r in reversed(rows))
+
+    def since(self, seq: int) -> List[tuple]:
+        with self._lock:
+            return [s for s in self.buffer if s[0] > seq]
+
+    def latest(self, n: int) -> List[tuple]:
+        with self._lock:
+            return list(self.buffer)[-n:]
+
+_pollers: Dict[str, RealtimePoller] = {}
+_pollers_lock = threading.Lock()
+
+def poller(property_id: Optional[str] = None) -> RealtimePoller:
+    ids = _property_list(property_id)
+    if len(ids) != 1:
+        raise ValueError("informe uma única property")
+    p = _pollers.get(ids[0])
+    if p is None:
+        with _pollers_lock:
+            p = _pollers.setdefault(ids[0], RealtimePoller(ids[0]))
+    return p
+
+def snapshots(property_id: Optional[str] = None, limit: int = 1) -> dict:
+    p = poller(property_id)
+    p.touch()
+    p.sync()
+    return {
+        "property_id": p.property_id,
+        "interval_seconds": INTERVAL,
+        "last_error": p.last_error,
+        "snapshots": [json.loads(payload) for _, payload in p.latest(limit)],
+    }
+
+def _event(seq: int, payload: str) -> str:
+    return f"id: {seq}\nevent: snapshot\ndata: {payload}\n\n"
+
+async def sse_events(p: RealtimePoller, last_event_id: Optional[str], is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+    """
+    Server-Sent Events a partir do buffer: começa pelo mais recente (ou pelo que vier depois de Last-Event-ID)
+    e envia cada novo retrato; comentários periódicos mantêm a conexão viva atrás de proxies.
+    O seq vem da tabela compartilhada, então Last-Event-ID vale em qualquer worker.
+    """
+    try:
+        sent = int(last_event_id) if last_event_id else None
+    except ValueError:
+        sent = None
+    p.touch()
+    if sent is None:
+        await asyncio.to_thread(p.sync)
+        latest = p.latest(1)
+        sent = latest[0][0] - 1 if latest else 0
+    yield f"retry: {int(INTERVAL * 1000)}\n\n"
+    quiet = 0.0
+    while not await is_disconnected():
+        p.touch()
+        pending = p.since(sent)
+        for seq, payload in pending:
+            yield _event(seq, payload)
+            sent = seq
+        if pending:
+            quiet = 0.0
+        elif quiet >= HEARTBEAT_SECONDS:
+            yield ": ping\n\n"
+            quiet = 0.0
+        await asyncio.sleep(1.0)
+        quiet += 1.0
@@ -0,0 +1,85 @@
+from typing import Callable, Dict, NamedTuple, Set, Tuple
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import BigInteger, Float, Integer, Numeric
+from models.models_google_analytics import GAAds, GAContent, GAEcommerce, GAEngagement, GAEvents, GAPromotions, GAUsers
+
+# Colunas que não vêm de métricas/dimensões do GA
+_SKIP = {"id", "property_id", "date", "created_at", "updated_at"}
+
+class Field(NamedTuple):
+    column: str
+    # tipo da coluna de destino ("int", "float" ou "text"); só valida o que chega do GA, não escolhe o conversor
+    target: str
+
+def _to_camel(column: str) -> str:
+    # active_1_day_users -> active1DayUsers, dau_per_mau -> dauPerMau
+    head, *rest = column.split("_")
+    return head + "".join(p[:1].upper() + p[1:] for p in rest)
+
+def _text(col):
+    return pc.cast(col, pa.string())
+
+def _int(col):
+    if pa.types.is_floating(col.type):
+        col = pc.round(col)
+    return pc.cast(col, pa.int64())
+
+def _float(col):
+    return pc.cast(col, pa.float64())
+
+# Conversor pelo tipo do GA: ga_columnar.decode tipa cada métrica pelo metric_headers
+# (TYPE_INTEGER -> int64; float, moeda, segundos, ... -> float64) e as dimensões como texto
+_CONVERTERS: Dict[str, Callable[[pa.ChunkedArray], pa.ChunkedArray]] = {"int": _int, "float": _float, "text": _text}
+
+def _ga_kind(arrow_type: pa.DataType) -> str:
+    if pa.types.is_integer(arrow_type):
+        return "int"
+    if pa.types.is_floating(arrow_type):
+        return "float"
+    return "text"
+
+def _target(col_type) -> str:
+    if isinstance(col_type, (BigInteger, Integer)):
+        return "int"
+    if isinstance(col_type, (Numeric, Float)):
+        return "float"
+    return "text"
+
+_warned: Set[Tuple[str, str]] = set()
+
+def convert(model_cls, name: str, col: pa.ChunkedArray) -> pa.ChunkedArray:
+    """
+    Converte a coluna Arrow da métrica/dimensão `name` pelo tipo que o GA declarou e confere se cabe na coluna do modelo.
+    Inteiro em coluna numérica é sempre aceito; métrica fracionária em coluna inteira é arredondada com aviso;
+    número em coluna de texto (ou o contrário) é erro.
+    """
+    f = fields(model_cls)[name]
+    kind = _ga_kind(col.type)
+    if kind == f.target or (kind == "int" and f.target == "float"):
+        return _CONVERTERS[kind](col)
+    if kind == "float" and f.target == "int":
+        key = (model_cls.__tablename__, name)
+        if key not in _warned:
+            _warned.add(key)
+            print(f"Aviso: métrica fracionária do GA {name} gravada arredondada na coluna inteira {model_cls.__tablename__}.{f.column}")
+        return _int(col)
+    raise ValueError(f"{name} chega do GA como {kind} e não cabe na coluna {model_cls.__tablename__}.{f.column} ({f.target})")
+
+def _build(model_cls) -> Dict[str, Field]:
+    return {
+        _to_camel(c.name): Field(c.name, _target(c.type))
+        for c in model_cls.__table__.columns
+        if c.name not in _SKIP
+    }
+
+# Nome GA (métrica ou dimensão) -> coluna do modelo e seu tipo, montado uma vez na importação
+REGISTRY: Dict[type, Dict[str, Field]] = {
+    m: _build(m) for m in (GAUsers, GAEngagement, GAEvents, GAContent, GAEcommerce, GAAds, GAPromotions)
+}
+
+def fields(model_cls) -> Dict[str, Field]:
+    f = REGISTRY.get(model_cls)
+    if f is None:
+        f = REGISTRY.setdefault(model_cls, _build(model_cls))
+    return f
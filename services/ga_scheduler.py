@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from fastapi import HTTPException
+
+# Prioridade (menor primeiro) e fração da cota por hora/dia que cada faixa deixa de reserva para as de cima
+LANES = {
+    "interactive": (0, 0.0),
+    "sync": (1, 0.15),
+    "backfill": (2, 0.30),
+}
+
+_lane: ContextVar[str] = ContextVar("ga_lane", default="interactive")
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name) or default)
+    except Exception:
+        return default
+
+@contextmanager
+def lane(name: str):
+    """Executa as chamadas ao GA do bloco (inclusive as submetidas ao executor) na faixa indicada."""
+    if name not in LANES:
+        raise ValueError(f"faixa inválida: {name}. Use {list(LANES)}")
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+def current_lane() -> str:
+    return _lane.get()
+
+class PropertyScheduler:
+    """
+    Admissão de requisições à Data API de uma property.
+    Usa o propertyQuota devolvido em cada resposta (tokens restantes na hora e no dia) e o número de
+    requisições em voo para segurar as faixas de menor prioridade antes de a cota acabar.
+    """
+
+    def __init__(self, property_id: str):
+        self.property_id = property_id
+        self.cap_hour = _env_float("GA_TOKENS_PER_HOUR", 40000)
+        self.cap_day = _env_float("GA_TOKENS_PER_DAY", 200000)
+        self.max_concurrent = int(_env_float("GA_MAX_CONCURRENT_REQUESTS", 10))
+        self.remaining_hour: Optional[float] = None
+        self.remaining_day: Optional[float] = None
+        self.observed_at = 0.0
+        self.avg_cost = 10.0
+        self.in_flight = 0
+        # ticket da requisição admitida como sonda (só ela libera a próxima)
+        self.probing: Optional[object] = None
+        self.waiting: Dict[str, deque] = {name: deque() for name in LANES}
+        self.admitted: Dict[str, int] = {name: 0 for name in LANES}
+        self._cond = threading.Condition()
+
+    def _tokens_ok(self, lane_name: str) -> bool:
+        reserve = LANES[lane_name][1]
+        pending = (self.in_flight + 1) * self.avg_cost
+        if self.remaining_hour is not None and self.remaining_hour - pending < reserve * self.cap_hour:
+            return False
+        if self.remaining_day is not None and self.remaining_day - pending < reserve * self.cap_day:
+            return False
+        return True
+
+    def _stale(self) -> bool:
+        return time.time() - self.observed_at >= _env_float("GA_SCHED_PROBE_SECONDS", 60)
+
+    def _admissible(self, lane_name: str, ticket: object) -> bool:
+        if self.in_flight >= self.max_concurrent:
+            return False
+        if self.waiting[lane_name][0] is not ticket:
+            return False
+        prio = LANES[lane_name][0]
+        for other, (p, _) in LANES.items():
+            if p < prio and self.waiting[other] and self._tokens_ok(other):
+                return False
+        if self._tokens_ok(lane_name):
+            return True
+        # cota aparentemente baixa com leitura antiga: libera uma sonda para atualizar os números
+        if self._stale() and self.probing is None:
+            self.probing = ticket
+            return True
+        return False
+
+    def acquire(self) -> object:
+        lane_name = current_lane()
+        ticket = object()
+        max_wait = _env_float("GA_SCHED_INTERACTIVE_WAIT", 15) if lane_name == "interactive" else None
+        deadline = time.monotonic() + max_wait if max_wait is not None else None
+        with self._cond:
+            self.waiting[lane_name].append(ticket)
+            try:
+                while not self._admissible(lane_name, ticket):
+                    left = None if deadline is None else deadline - time.monotonic()
+                    if left is not None and left <= 0:
+                        raise HTTPException(
+                            status_code=429,
+                            detail={"error": "cota da property GA próxima do limite; tente novamente", "property_id": self.property_id},
+                            headers={"Retry-After": str(int(_env_float("GA_SCHED_PROBE_SECONDS", 60)))},
+                        )
+                    self._cond.wait(timeout=1.0 if left is None else min(left, 1.0))
+            finally:
+                self.waiting[lane_name].remove(ticket)
+                self._cond.notify_all()
+            self.in_flight += 1
+            self.admitted[lane_name] += 1
+        return ticket
+
+    def release(self, ticket: object):
+        with self._cond:
+            self.in_flight -= 1
+            if self.probing is ticket:
+                self.probing = None
+            self._cond.notify_all()
+
+    def observe(self, property_quota):
+        if property_quota is None:
+            return
+        hour = getattr(property_quota, "tokens_per_hour", None)
+        day = getattr(property_quota, "tokens_per_day", None)
+        with self._cond:
+            if hour is not None and (hour.consumed or hour.remaining):
+                self.remaining_hour = float(hour.remaining)
+                self.avg_cost = 0.8 * self.avg_cost + 0.2 * float(hour.consumed or 0)
+            if day is not None and (day.consumed or day.remaining):
+                self.remaining_day = float(day.remaining)
+            self.observed_at = time.time()
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "property_id": self.property_id,
+                "remaining_tokens_hour": self.remaining_hour,
+                "remaining_tokens_day": self.remaining_day,
+                "cap_tokens_hour": self.cap_hour,
+                "cap_tokens_day": self.cap_day,
+                "avg_request_cost": round(self.avg_cost, 1),
+                "in_flight": self.in_flight,
+                "max_concurrent": self.max_concurrent,
+                "waiting": {k: len(v) for k, v in self.waiting.items()},
+                "admitted": dict(self.admitted),
+                "observed_at": self.observed_at or None,
+            }
+
+_schedulers: Dict[str, PropertyScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+def scheduler(property_id: str) -> PropertyScheduler:
+    sch = _schedulers.get(property_id)
+    if sch is None:
+        with _schedulers_lock:
+            sch = _schedulers.setdefault(property_id, PropertyScheduler(property_id))
+    return sch
+
+@contextmanager
+def slot(property_id: str):
+    sch = scheduler(property_id)
+    ticket = sch.acquire()
+    try:
+        yield sch
+    finally:
+        sch.release(ticket)
+
+def observe(property_id: str, property_quota):
+    scheduler(property_id).observe(property_quota)
+
+def state() -> list:
+    return [s.snapshot() for s in list(_schedulers.values())]
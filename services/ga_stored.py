@@ -0,0 +1,199 @@
+from datetime import date as _date
+from typing import Dict, List, Optional
+from sqlalchemy import Date, Text, case, cast, func
+from core.db import get_session
+from core.pagination import keyset_page
+from services.google_analytics import _split_csv
+from models.models_google_analytics import (
+    GAUsers, GAEngagement, GAEvents, GAContent, GAEcommerce,
+    GAAds, GAPromotions, NATURAL_KEYS, natural_key
+)
+
+STORED_TABLES = {
+    "users": GAUsers,
+    "engagement": GAEngagement,
+    "events": GAEvents,
+    "content": GAContent,
+    "ecommerce": GAEcommerce,
+    "ads": GAAds,
+    "promotions": GAPromotions,
+}
+
+GRANULARITIES = ("day", "week", "month")
+
+_SKIP_COLUMNS = {"id", "property_id", "date", "created_at", "updated_at"}
+
+def _model(table: str):
+    model_cls = STORED_TABLES.get(table)
+    if model_cls is None:
+        raise ValueError(f"tabela desconhecida: {table}. Disponíveis: {list(STORED_TABLES)}")
+    return model_cls
+
+def _dimension_columns(model_cls) -> List[str]:
+    return [c.name for c in model_cls.__table__.columns if c.name not in _SKIP_COLUMNS and isinstance(c.type, Text)]
+
+def _metric_columns(model_cls) -> List[str]:
+    return [c.name for c in model_cls.__table__.columns if c.name not in _SKIP_COLUMNS and not isinstance(c.type, Text)]
+
+def _per(numerator, rate):
+    # Base de uma razão que não é gravada: numerador / razão (ex.: sessões = engaged_sessions / engagement_rate)
+    return numerator / func.nullif(rate, 0)
+
+_E, _C, _EC, _A = GAEngagement, GAContent, GAEcommerce, GAAds
+# Base de cada taxa/média/razão: a agregação no balde é a média ponderada por ela, não a média simples das linhas
+RATE_WEIGHTS = {
+    GAUsers: {
+        "dau_per_mau": GAUsers.active_28_day_users,
+        "dau_per_wau": GAUsers.active_7_day_users,
+        "wau_per_mau": GAUsers.active_28_day_users,
+    },
+    GAEngagement: {
+        "engagement_rate": _per(_E.engaged_sessions, _E.engagement_rate),
+        "average_session_duration": _per(_E.engaged_sessions, _E.engagement_rate),
+        "events_per_session": _per(_E.engaged_sessions, _E.engagement_rate),
+        "session_key_event_rate": _per(_E.engaged_sessions, _E.engagement_rate),
+        # a tabela não guarda usuários; sessões é o volume disponível mais próximo
+        "user_key_event_rate": _per(_E.engaged_sessions, _E.engagement_rate),
+    },
+    GAEvents: {
+        "event_count_per_user": _per(GAEvents.event_count, GAEvents.event_count_per_user),
+    },
+    GAContent: {
+        "screen_page_views_per_session": _per(_C.screen_page_views, _C.screen_page_views_per_session),
+        "screen_page_views_per_user": _per(_C.screen_page_views, _C.screen_page_views_per_user),
+        "bounce_rate": _per(_C.screen_page_views, _C.screen_page_views_per_session),
+    },
+    GAEcommerce: {
+        "transactions_per_purchaser": _per(_EC.transactions, _EC.transactions_per_purchaser),
+        "average_purchase_revenue": _EC.transactions,
+        "average_purchase_revenue_per_paying_user": _per(_EC.transactions, _EC.transactions_per_purchaser),
+        "average_purchase_revenue_per_user": _per(_EC.total_revenue, _EC.average_revenue_per_user),
+        "average_revenue_per_user": _per(_EC.total_revenue, _EC.average_revenue_per_user),
+        "cart_to_view_rate": _EC.items_viewed,
+        "purchase_to_view_rate": _EC.items_viewed,
+        "purchaser_rate": _per(_EC.total_revenue, _EC.average_revenue_per_user),
+        "first_time_purchaser_rate": _per(_EC.total_revenue, _EC.average_revenue_per_user),
+        "first_time_purchasers_per_new_user": _per(_EC.first_time_purchasers, _EC.first_time_purchasers_per_new_user),
+    },
+    GAAds: {
+        "advertiser_ad_cost_per_click": _A.advertiser_ad_clicks,
+        "advertiser_ad_cost_per_key_event": _per(_A.advertiser_ad_cost, _A.advertiser_ad_cost_per_key_event),
+        "return_on_ad_spend": _A.advertiser_ad_cost,
+    },
+    GAPromotions: {
+        "item_promotion_click_through_rate": GAPromotions.items_viewed_in_promotion,
+        "item_list_click_through_rate": GAPromotions.item_list_view_events,
+    },
+}
+
+def _aggregate(model_cls, col_name: str, col):
+    # Médias, taxas e razões não são somáveis entre linhas: média ponderada pela base (linhas sem a métrica não pesam)
+    weight = RATE_WEIGHTS.get(model_cls, {}).get(col_name)
+    if weight is not None:
+        return func.sum(col * weight) / func.nullif(func.sum(case((col.isnot(None), weight))), 0)
+    if col_name.startswith("average_") or "_rate" in col_name or "_per_" in col_name:
+        return func.avg(col)
+    return func.sum(col)
+
+def _parse_iso(d: Optional[str], what: str) -> Optional[_date]:
+    if not d:
+        return None
+    try:
+        return _date.fromisoformat(d.strip())
+    except Exception:
+        raise ValueError(f"{what} inválida: {d}. Use YYYY-MM-DD")
+
+def _parse_filters(filters: Optional[List[str]], dims: List[str]) -> Dict[str, List[str]]:
+    out: Dict[str, List[str]] = {}
+    for f in filters or []:
+        if ":" not in f:
+            raise ValueError(f"filtro inválido: {f}. Use coluna:valor ou coluna:valor1|valor2")
+        k, v = f.split(":", 1)
+        k = k.strip()
+        if k not in dims:
+            raise ValueError(f"filtro em dimensão inválida: {k}. Permitidas: {dims}")
+        out.setdefault(k, []).extend([x for x in v.split("|")])
+    return out
+
+def _row_dict(names: List[str], row) -> dict:
+    return {n: row[i] for i, n in enumerate(names)}
+
+def stored_query(
+    table: str,
+    start_date: Optional[str],
+    end_date: Optional[str],
+    property_id: Optional[str] = None,
+    metrics: Optional[str] = None,
+    filters: Optional[List[str]] = None,
+    group_by: Optional[str] = None,
+    granularity: Optional[str] = None,
+    limit: int = 1000,
+    cursor: Optional[str] = None,
+):
+    model_cls = _model(table)
+    dims = _dimension_columns(model_cls)
+    all_metrics = _metric_columns(model_cls)
+    metrics = _split_csv(metrics or "") or all_metrics
+    bad = [m for m in metrics if m not in all_metrics]
+    if bad:
+        raise ValueError(f"métricas inválidas: {bad}. Permitidas: {all_metrics}")
+    group_by = _split_csv(group_by or "")
+    bad = [d for d in group_by if d not in dims]
+    if bad:
+        raise ValueError(f"dimensões inválidas: {bad}. Permitidas: {dims}")
+    if granularity and granularity not in GRANULARITIES:
+        raise ValueError(f"granularity inválida: {granularity}. Use {list(GRANULARITIES)}")
+    start = _parse_iso(start_date, "start_date")
+    end = _parse_iso(end_date, "end_date")
+    where = []
+    if property_id:
+        where.append(model_cls.property_id == property_id)
+    if start:
+        where.append(model_cls.date >= start)
+    if end:
+        where.append(model_cls.date <= end)
+    for k, values in _parse_filters(filters, dims).items():
+        where.append(getattr(model_cls, k).in_(values))
+
+    s = get_session()
+    try:
+        if not granularity and not group_by:
+            names = ["property_id", "date"] + dims + metrics
+            q = s.query(*[getattr(model_cls, n) for n in names]).filter(*where)
+            # Mesmas expressões do índice único ux_ga_<tabela>_natural_key: ordenação e seek usam o índice
+            exprs = natural_key(model_cls)
+            key_dims = NATURAL_KEYS[model_cls]
+            rows, next_cursor = keyset_page(
+                q, exprs, cursor, limit,
+                key=lambda r: (r.property_id, r.date, *(getattr(r, d) or "" for d in key_dims)),
+            )
+            out = [_row_dict(names, r) for r in rows]
+        else:
+            if granularity == "day" or not granularity:
+                bucket = model_cls.date
+            else:
+                bucket = cast(func.date_trunc(granularity, model_cls.date), Date)
+            bucket = bucket.label("bucket")
+            dim_exprs = [func.coalesce(getattr(model_cls, d), "").label(f"dim_{d}") for d in group_by]
+            aggs = [_aggregate(model_cls, m, getattr(model_cls, m)).label(m) for m in metrics]
+            # Sempre agrupa por property: sem filtro de property_id, properties diferentes não se somam
+            keys = [model_cls.property_id, bucket] + dim_exprs
+            q = s.query(*keys, *aggs).filter(*where).group_by(*keys)
+            rows, next_cursor = keyset_page(q, keys, cursor, limit, key=lambda r: r[:len(keys)])
+            names = ["property_id", "date"] + group_by + metrics
+            out = [_row_dict(names, r) for r in rows]
+        return {
+            "table": table,
+            "property_id": property_id,
+            "start_date": start.isoformat() if start else None,
+            "end_date": end.isoformat() if end else None,
+            "granularity": granularity,
+            "group_by": group_by,
+            "metrics": metrics,
+            "limit": limit,
+            "row_count": len(out),
+            "next_cursor": next_cursor,
+            "rows": out,
+        }
+    finally:
+        s.close()
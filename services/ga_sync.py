@@ -0,0 +1,99 @@
+import os
+from datetime import date as _date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from sqlalchemy.dialects.postgresql import insert
+from core.db import get_session
+from models.models_google_analytics import GASyncState
+from services import ga_scheduler
+from services.google_analytics import GA4Service, _get_service, _property_list, _split_csv, _submit, _background_executor
+
+# Últimos dias ainda sujeitos a reprocessamento no GA; são sempre buscados de novo
+DEFAULT_REFETCH_DAYS = int(os.getenv("GA_SYNC_REFETCH_DAYS") or 3)
+# Janela da primeira sincronização de uma property/relatório sem watermark
+INITIAL_DAYS = int(os.getenv("GA_SYNC_INITIAL_DAYS") or 30)
+
+def _defaults(report: str) -> Dict[str, List[str]]:
+    spec = GA4Service.REPORTS[report]
+    return spec.get("defaults") or GA4Service.PRESETS[report]
+
+def get_state(property_id: Optional[str] = None) -> List[dict]:
+    s = get_session()
+    try:
+        q = s.query(GASyncState)
+        if property_id:
+            q = q.filter(GASyncState.property_id == property_id)
+        cols = [c.name for c in GASyncState.__table__.columns]
+        return [{c: getattr(o, c) for c in cols} for o in q.order_by(GASyncState.property_id, GASyncState.report).all()]
+    finally:
+        s.close()
+
+def _watermark(property_id: str, report: str) -> Optional[_date]:
+    s = get_session()
+    try:
+        st = s.get(GASyncState, (property_id, report))
+        return st.watermark if st else None
+    finally:
+        s.close()
+
+def _save_watermark(property_id: str, report: str, watermark: _date, start: _date, row_count: int):
+    now = datetime.now(timezone.utc)
+    values = {"watermark": watermark, "last_start_date": start, "last_row_count": row_count, "last_run_at": now}
+    stmt = insert(GASyncState).values(property_id=property_id, report=report, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GASyncState.property_id, GASyncState.report],
+        set_=dict(values, updated_at=now),
+    )
+    s = get_session()
+    try:
+        s.execute(stmt)
+        s.commit()
+    finally:
+        s.close()
+
+def sync_window(watermark: Optional[_date], refetch_days: int, today: Optional[_date] = None):
+    """(início, fim) da próxima sincronização: o dia após o watermark, recuado `refetch_days` dias ainda instáveis."""
+    today = today or _date.today()
+    if watermark is None:
+        start = today - timedelta(days=INITIAL_DAYS)
+    else:
+        start = min(watermark + timedelta(days=1), today - timedelta(days=max(refetch_days - 1, 0)))
+    return start, today
+
+def sync_report(svc: GA4Service, report: str, refetch_days: int = DEFAULT_REFETCH_DAYS) -> dict:
+    if report not in GA4Service.REPORTS:
+        raise ValueError(f"relatório desconhecido: {report}. Disponíveis: {list(GA4Service.REPORTS)}")
+    wm = _watermark(svc.property_id, report)
+    start, end = sync_window(wm, refetch_days)
+    d = _defaults(report)
+    result = getattr(svc, f"{report}_report")(
+        list(d["metrics"]), list(d["dimensions"]), start.isoformat(), end.isoformat(),
+        GA4Service.PAGE_SIZE, 0, True,
+    )
+    _save_watermark(svc.property_id, report, end, start, int(result.get("row_count") or 0))
+    return {
+        "report": report,
+        "property_id": svc.property_id,
+        "previous_watermark": wm.isoformat() if wm else None,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "row_count": result.get("row_count"),
+    }
+
+def sync(reports: Optional[str] = None, refetch_days: Optional[int] = None, properties: Optional[str] = None) -> dict:
+    names = _split_csv(reports) if reports else list(GA4Service.REPORTS)
+    bad = [n for n in names if n not in GA4Service.REPORTS]
+    if bad:
+        raise ValueError(f"relatórios desconhecidos: {bad}. Disponíveis: {list(GA4Service.REPORTS)}")
+    refetch = DEFAULT_REFETCH_DAYS if refetch_days is None else refetch_days
+    # Sem lista explícita sincroniza todas as properties configuradas; cada uma usa o próprio agendador de cota
+    services = [_get_service(pid) for pid in _property_list(properties or "all")]
+    with ga_scheduler.lane("sync"):
+        futures = [(svc, n, _submit(sync_report, svc, n, refetch, executor=_background_executor)) for svc in services for n in names]
+    out = []
+    for svc, n, f in futures:
+        try:
+            out.append(f.result())
+        except Exception as e:
+            # watermark não avança; a próxima execução repete a janela
+            out.append({"report": n, "property_id": svc.property_id, "error": str(e)})
+    return {"reports": out}
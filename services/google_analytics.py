@@ -1,14 +1,88 @@
+import grpc
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import DateRange, Metric, Dimension, RunReportRequest
-from typing import List, Optional, Dict, Tuple
-from datetime import date as _date
+from google.analytics.data_v1beta.services.beta_analytics_data.transports import BetaAnalyticsDataGrpcTransport
+from google.analytics.data_v1beta.types import DateRange, Metric, Dimension, RunReportRequest, BatchRunReportsRequest
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pyarrow as pa
+import pyarrow.compute as pc
+import contextvars
+import itertools
+import threading
+import time
+from typing import Any, Callable, List, Optional, Dict, Tuple
+from datetime import date as _date, timedelta
 import os
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
 from core.db import Base, engine, get_session
+from core.tracing import tracer
+from core import quota
+from core.profiling import track as _track_thread
+from services import ga_cache, ga_columnar, ga_metadata, ga_registry, ga_scheduler
+from services.summary import schedule_refresh
+from models import models_google_analytics
 from models.models_google_analytics import (
     GAUsers, GAEngagement, GAEvents, GAContent, GAEcommerce,
     GAAds, GAPromotions
 )
 
+# Keepalive evita que proxies/NAT derrubem o canal ocioso entre requisições e o próximo report pague reconexão
+_GRPC_OPTIONS = [
+    ("grpc.keepalive_time_ms", int(os.getenv("GA_KEEPALIVE_MS") or 30000)),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.max_receive_message_length", -1),
+]
+# Tempo máximo esperando os canais conectarem no warm-up
+_WARM_TIMEOUT = float(os.getenv("GA_WARM_TIMEOUT") or 10)
+
+class _ClientPool:
+    """
+    Clientes da Data API compartilhados pelo processo. Cada cliente tem um canal gRPC próprio
+    (thread-safe, multiplexado em HTTP/2); o pool só distribui a carga entre canais em round-robin.
+    """
+
+    def __init__(self, size: int):
+        self.size = max(size, 1)
+        self._clients: List[BetaAnalyticsDataClient] = []
+        self._channels: List[grpc.Channel] = []
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+
+    def _ensure(self):
+        if self._clients:
+            return
+        with self._lock:
+            if not self._clients:
+                channels = [
+                    BetaAnalyticsDataGrpcTransport.create_channel("analyticsdata.googleapis.com:443", options=_GRPC_OPTIONS)
+                    for _ in range(self.size)
+                ]
+                self._clients = [BetaAnalyticsDataClient(transport=BetaAnalyticsDataGrpcTransport(channel=ch)) for ch in channels]
+                self._channels = channels
+
+    def warm(self, timeout: float = _WARM_TIMEOUT):
+        """Cria os clientes e conecta cada canal (DNS, TCP, TLS, HTTP/2); canais gRPC só conectam na primeira chamada."""
+        self._ensure()
+        ready = [grpc.channel_ready_future(ch) for ch in self._channels]
+        deadline = time.monotonic() + timeout
+        try:
+            for f in ready:
+                f.result(timeout=max(deadline - time.monotonic(), 0))
+        except grpc.FutureTimeoutError:
+            raise RuntimeError(f"canais gRPC do GA não conectaram em {timeout:g}s")
+        finally:
+            for f in ready:
+                f.cancel()
+
+    def get(self) -> BetaAnalyticsDataClient:
+        if not self._clients:
+            self._ensure()
+        return self._clients[next(self._next) % len(self._clients)]
+
+_client_pool = _ClientPool(int(os.getenv("GA_CLIENT_POOL_SIZE") or 2))
+
 class GA4Service:
     PRESETS = {
         "users": {
@@ -123,9 +197,59 @@ class GA4Service:
             "dimensions": ["date", "country", "pagePath"],
         },
     }
+    # Relatórios persistidos: modelo de destino, dimensões de chave e métricas/dimensões padrão
+    REPORTS = {
+        "users": {"model": GAUsers, "key_dims": ["country","device_category"]},
+        "engagement": {"model": GAEngagement, "key_dims": ["device_category","country"]},
+        "events": {"model": GAEvents, "key_dims": ["event_name","page_path"]},
+        "content": {"model": GAContent, "key_dims": ["page_title","page_path"]},
+        "promotions": {"model": GAPromotions, "key_dims": ["session_default_channel_group"]},
+        "ecommerce_items": {
+            "model": GAEcommerce,
+            "key_dims": ["item_id","item_name","item_category"],
+            "defaults": {
+                "metrics": ["itemsPurchased","itemsViewed","itemsAddedToCart","itemsCheckedOut","itemRevenue","itemDiscountAmount","grossItemRevenue"],
+                "dimensions": ["date","itemId","itemName","itemCategory"],
+            },
+        },
+        "ecommerce_revenue": {
+            "model": GAEcommerce,
+            "key_dims": ["session_default_channel_group"],
+            "defaults": {
+                "metrics": ["ecommercePurchases","purchaseRevenue","grossPurchaseRevenue","totalRevenue","transactions","transactionsPerPurchaser","averagePurchaseRevenue","averagePurchaseRevenuePerPayingUser","averagePurchaseRevenuePerUser","averageRevenuePerUser","purchaserRate","firstTimePurchasers","firstTimePurchaserRate","firstTimePurchasersPerNewUser"],
+                "dimensions": ["date","sessionDefaultChannelGroup"],
+            },
+        },
+        "ecommerce_funnel": {
+            "model": GAEcommerce,
+            "key_dims": ["session_default_channel_group"],
+            "defaults": {
+                "metrics": ["addToCarts","checkouts","ecommercePurchases","cartToViewRate","purchaseToViewRate"],
+                "dimensions": ["date","sessionDefaultChannelGroup"],
+            },
+        },
+        "ads": {
+            "model": GAAds,
+            "key_dims": ["campaign_name","campaign_id"],
+            "defaults": {
+                "metrics": ["advertiserAdClicks","advertiserAdImpressions","advertiserAdCost","advertiserAdCostPerClick"],
+                "dimensions": ["date","campaignName","campaignId"],
+            },
+        },
+    }
+
+    # Limites da Data API: 10 métricas por relatório e 5 relatórios por batchRunReports
+    MAX_METRICS_PER_REQUEST = 10
+    MAX_REPORTS_PER_BATCH = 5
+    # Linhas por página no modo all_rows (a API aceita até 250.000)
+    PAGE_SIZE = min(int(os.getenv("GA_PAGE_SIZE") or 100000), 250000)
+
     def __init__(self, property_id: str):
         self.property_id = property_id
-        self.client = BetaAnalyticsDataClient()
+
+    @property
+    def client(self) -> BetaAnalyticsDataClient:
+        return _client_pool.get()
 
     def list_presets(self) -> List[str]:
         return list(self.PRESETS.keys())
@@ -145,83 +269,52 @@ class GA4Service:
                         add(d)
         return dims if dims else ["date"]
 
-    def _camel_to_snake(self, name: str) -> str:
-        out = []
-        for ch in name:
-            if ch.isupper():
-                out.append("_")
-                out.append(ch.lower())
-            else:
-                out.append(ch)
-        s = "".join(out).strip("_")
-        s = s.replace("__", "_")
-        return s
-
-    def _parse_date_value(self, d: Optional[str], fallback: str):
-        if not d:
-            y, m, dd = [int(x) for x in fallback.split("-")]
-            return _date(y, m, dd)
-        ds = d.strip()
-        if len(ds) == 8 and ds.isdigit():
-            return _date(int(ds[0:4]), int(ds[4:6]), int(ds[6:8]))
-        try:
-            y, m, dd = [int(x) for x in ds.split("-")]
-            return _date(y, m, dd)
-        except Exception:
-            return None
-
-    def _to_number(self, name: str, value: str):
-        if value is None or value == "":
-            return None
-        lname = name.lower()
-        try:
-            if any(k in lname for k in ["rate", "per", "average", "revenue", "amount", "discount"]):
-                return float(value)
-            if "duration" in lname:
-                return int(float(value))
-            if "." in value or "e" in value.lower():
-                return float(value)
-            return int(value)
-        except Exception:
-            try:
-                return float(value)
-            except Exception:
-                return None
-
-    def _upsert_rows(self, model_cls, key_dims: List[str], rows: List[dict], start_date: str, end_date: str):
+    def _upsert_rows(self, model_cls, table: pa.Table, start_date: str, end_date: str):
+        with tracer.start_as_current_span("ga.upsert_rows") as span:
+            span.set_attribute("db.table", model_cls.__tablename__)
+            span.set_attribute("ga.row_count", table.num_rows)
+            self._upsert_rows_tx(model_cls, table, start_date, end_date)
+        schedule_refresh()
+
+    def _columns_for(self, model_cls, table: pa.Table, end_date: str) -> pa.Table:
+        """Colunas do GA convertidas, coluna a coluna, para as colunas do modelo (sem passar por linhas)."""
+        fields = ga_registry.fields(model_cls)
+        cols: Dict[str, Any] = {}
+        for name in table.column_names:
+            f = fields.get(name)
+            if f is not None:
+                cols[f.column] = ga_registry.convert(model_cls, name, table.column(name))
+        fallback = pa.scalar(_resolve_date(end_date), pa.date32())
+        if "date" in table.column_names:
+            cols["date"] = pc.fill_null(ga_columnar.parse_dates(table.column("date")), fallback)
+        else:
+            cols["date"] = pa.repeat(fallback, table.num_rows)
+        cols["property_id"] = pa.repeat(pa.scalar(self.property_id, pa.string()), table.num_rows)
+        return pa.table(cols)
+
+    UPSERT_BATCH = 1000
+
+    def _upsert_rows_tx(self, model_cls, table: pa.Table, start_date: str, end_date: str):
+        """
+        INSERT ... ON CONFLICT (chave natural) DO UPDATE em lotes de UPSERT_BATCH linhas, numa só transação.
+        Nada é lido antes: o custo depende só do tamanho da página gravada, não do que já está na tabela.
+        """
+        columns = self._columns_for(model_cls, table, end_date)
+        if columns.num_rows == 0:
+            return
+        key = models_google_analytics.NATURAL_KEYS[model_cls]
+        updates = [c for c in columns.column_names if c not in ("property_id", "date", *key)]
+        # Linhas Python só na fronteira com o driver do banco; uma por chave (o mesmo comando não pode tocar duas vezes a mesma linha)
+        rows = list({(r["date"], *(r.get(c) or "" for c in key)): r for r in columns.to_pylist()}.values())
         s = get_session()
         try:
-            for row in rows:
-                dt = self._parse_date_value(row.get("date"), end_date)
-                dim_values: Dict[str, Optional[str]] = {}
-                for d in key_dims:
-                    ga_key = d if d in row else None
-                    if not ga_key:
-                        for k in row.keys():
-                            if self._camel_to_snake(k) == d:
-                                ga_key = k
-                                break
-                    dim_values[d] = row.get(ga_key) if ga_key else None
-                q = s.query(model_cls).filter(
-                    model_cls.property_id == self.property_id,
-                    model_cls.date == dt,
+            for i in range(0, len(rows), self.UPSERT_BATCH):
+                stmt = insert(model_cls).values(rows[i:i + self.UPSERT_BATCH])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=models_google_analytics.natural_key(model_cls),
+                    set_=dict({c: stmt.excluded[c] for c in updates}, updated_at=func.now()),
                 )
-                for k, v in dim_values.items():
-                    q = q.filter(getattr(model_cls, k) == v)
-                existing = q.first()
-                if existing:
-                    target = existing
-                else:
-                    target = model_cls(property_id=self.property_id, date=dt)
-                    for k, v in dim_values.items():
-                        setattr(target, k, v)
-                    s.add(target)
-                for mk, mv in row.items():
-                    sk = self._camel_to_snake(mk)
-                    if sk == "date":
-                        continue
-                    if hasattr(model_cls, sk):
-                        setattr(target, sk, self._to_number(mk, mv) if isinstance(mv, str) else mv)
+                s.execute(stmt)
             s.commit()
         finally:
             s.close()
@@ -230,10 +323,10 @@ class GA4Service:
         for i in range(0, len(seq), n):
             yield seq[i:i+n]
 
-    def _validate_subset(self, items: List[str], allowed: List[str], what: str):
-        bad = [x for x in items if x not in allowed]
-        if bad:
-            raise ValueError(f"{what} inválidos: {bad}. Permitidos: {allowed}")
+    def _validate(self, metrics: List[str], dimensions: Optional[List[str]]):
+        # getMetadata/checkCompatibility em cache por property: combinações inválidas nem chegam ao runReport
+        if self.property_id:
+            ga_metadata.validate(self.client, self.property_id, metrics, dimensions)
 
     def get_active_users_last_7_days(self) -> int:
         if not self.property_id:
@@ -263,31 +356,156 @@ class GA4Service:
         if not self.property_id:
             raise ValueError("GA4_PROPERTY_ID ausente no ambiente")
         dims_used = dimensions or self.suggest_dimensions_for_metrics(metrics)
-        request = RunReportRequest(
+        cache_key = self._cache_key(metrics, dims_used, start_date, end_date, limit, offset)
+        if cache_key:
+            hit = ga_cache.get(cache_key)
+            if hit is not None:
+                # Período já consolidado: nenhuma chamada ao GA e nenhum token cobrado
+                table, total_rows = hit
+                return dict(self._table_to_result(table, total_rows, metrics, dims_used, start_date, end_date, limit, offset), cached=True)
+        request = self._build_request(metrics, dims_used, start_date, end_date, limit, offset)
+
+        with tracer.start_as_current_span("ga.run_report") as span:
+            span.set_attribute("ga.property_id", self.property_id)
+            span.set_attribute("ga.metrics", ",".join(metrics))
+            span.set_attribute("ga.dimensions", ",".join(dims_used or []))
+            span.set_attribute("ga.date_range", f"{start_date}..{end_date}")
+            span.set_attribute("ga.lane", ga_scheduler.current_lane())
+            quota.gate("ga")
+            with ga_scheduler.slot(self.property_id):
+                response = self.client.run_report(request)
+            span.set_attribute("ga.row_count", len(response.rows))
+        self._charge_quota(response)
+
+        table = ga_columnar.decode(response, metrics, dims_used)
+        if cache_key:
+            ga_cache.put(cache_key, self.property_id, _resolve_date(start_date), _resolve_date(end_date), table, response.row_count)
+        return self._table_to_result(table, response.row_count, metrics, dims_used, start_date, end_date, limit, offset)
+
+    def _cache_key(self, metrics: List[str], dims_used: List[str], start_date: str, end_date: str, limit: int, offset: int) -> Optional[str]:
+        # Só intervalos totalmente consolidados (fim há mais de GA_CACHE_SETTLED_DAYS dias) são cacheáveis
+        if not ga_cache.enabled():
+            return None
+        try:
+            start, end = _resolve_date(start_date), _resolve_date(end_date)
+        except ValueError:
+            return None
+        if not ga_cache.settled(end):
+            return None
+        return ga_cache.key(self.property_id, metrics, dims_used, start, end, limit, offset)
+
+    def run_report_all(
+        self,
+        metrics: List[str],
+        dimensions: Optional[List[str]],
+        start_date: str,
+        end_date: str,
+        on_page: Optional[Callable[[pa.Table], None]] = None,
+    ):
+        """
+        Busca todas as linhas do relatório: a primeira página informa o total (row_count da API) e os offsets restantes
+        são buscados em paralelo (limitado pelo executor). `on_page` recebe as páginas na ordem dos offsets,
+        à medida que ficam disponíveis.
+        """
+        size = self.PAGE_SIZE
+        first = self.run_report(metrics, dimensions, start_date, end_date, size, 0)
+        if on_page:
+            on_page(first["rows"])
+        tables = [first["rows"]]
+        offsets = list(range(size, first.get("total_rows") or 0, size))
+        if offsets:
+            if _in_worker():
+                pages = (self.run_report(metrics, first["dimensions"], start_date, end_date, size, o) for o in offsets)
+            else:
+                futures = [_submit(self.run_report, metrics, first["dimensions"], start_date, end_date, size, o) for o in offsets]
+                pages = (f.result() for f in futures)
+            for page in pages:
+                if on_page:
+                    on_page(page["rows"])
+                tables.append(page["rows"])
+        table = ga_columnar.concat(tables)
+        return dict(first, limit=size, offset=0, row_count=table.num_rows, total_rows=table.num_rows, rows=table, pages=len(offsets) + 1)
+
+    def run_report_sharded(
+        self,
+        metrics: List[str],
+        dimensions: List[str],
+        start_date: str,
+        end_date: str,
+        shard: str,
+        on_page: Optional[Callable[[pa.Table], None]] = None,
+    ):
+        """
+        Divide o período em semanas ou meses e busca cada fatia completa (all_rows) em paralelo.
+        As fatias são entregues a `on_page` e concatenadas em ordem de data.
+        """
+        if "date" not in (dimensions or []):
+            raise ValueError("shard requer a dimensão 'date'")
+        shards = _date_shards(start_date, end_date, shard)
+        if len(shards) == 1 or _in_worker():
+            parts = (self.run_report_all(metrics, dimensions, s, e) for s, e in shards)
+        else:
+            futures = [_submit(self.run_report_all, metrics, dimensions, s, e) for s, e in shards]
+            parts = (f.result() for f in futures)
+        tables: List[pa.Table] = []
+        first = None
+        pages = 0
+        for part in parts:
+            first = first or part
+            pages += part.get("pages", 1)
+            if on_page:
+                on_page(part["rows"])
+            tables.append(part["rows"])
+        table = ga_columnar.concat(tables)
+        return dict(first, start_date=start_date, end_date=end_date, limit=self.PAGE_SIZE, offset=0,
+                    row_count=table.num_rows, total_rows=table.num_rows, rows=table, pages=pages, shards=len(shards))
+
+    def _fetch(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int,
+               all_rows: bool = False, shard: Optional[str] = None, on_page: Optional[Callable[[pa.Table], None]] = None):
+        if shard:
+            return self.run_report_sharded(metrics, dimensions, start_date, end_date, shard, on_page)
+        if all_rows:
+            return self.run_report_all(metrics, dimensions, start_date, end_date, on_page)
+        result = self.run_report(metrics, dimensions, start_date, end_date, limit, offset)
+        if on_page:
+            on_page(result["rows"])
+        return result
+
+    def _persists(self, spec: Dict[str, Any], dimensions: List[str]) -> bool:
+        """
+        A tabela só recebe o resultado quando as dimensões pedidas são exatamente date + key_dims do relatório.
+        Com outras dimensões várias linhas do GA cairiam na mesma chave (uma sobrescrevendo a outra); nesse caso
+        o resultado só é devolvido.
+        """
+        fields = ga_registry.fields(spec["model"])
+        columns = {"date" if d == "date" else (fields[d].column if d in fields else None) for d in dimensions}
+        return len(columns) == len(dimensions) and columns == {"date", *spec["key_dims"]}
+
+    def _report(self, name: str, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int, all_rows: bool, shard: Optional[str] = None):
+        spec = self.REPORTS[name]
+        self._validate(metrics, dimensions)
+        persisted = self._persists(spec, dimensions)
+        persist = (lambda rows: self._upsert_rows(spec["model"], rows, start_date, end_date)) if persisted else None
+        return dict(self._fetch(metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard, on_page=persist), persisted=persisted)
+
+    def _build_request(self, metrics: List[str], dims_used: List[str], start_date: str, end_date: str, limit: int, offset: int) -> RunReportRequest:
+        return RunReportRequest(
             property=f"properties/{self.property_id}",
             date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
             metrics=[Metric(name=m) for m in metrics],
             dimensions=[Dimension(name=d) for d in dims_used] if dims_used else [],
             limit=limit,
             offset=offset,
+            return_property_quota=True,
         )
 
-        response = self.client.run_report(request)
-
-        results: List[dict] = []
-
-        for row in response.rows:
-            record = {}
-
-            if dims_used:
-                for i, dim in enumerate(dims_used):
-                    record[dim] = row.dimension_values[i].value
-
-            for j, metric in enumerate(metrics):
-                record[metric] = row.metric_values[j].value
-
-            results.append(record)
+    def _charge_quota(self, response):
+        # tokens consumidos por esta requisição na janela horária da propriedade
+        quota.charge("ga", response.property_quota.tokens_per_hour.consumed)
+        ga_scheduler.observe(self.property_id, response.property_quota)
 
+    def _table_to_result(self, table: pa.Table, total_rows: int, metrics: List[str], dims_used: List[str], start_date: str, end_date: str, limit: int, offset: int):
+        # As linhas seguem como tabela Arrow até a gravação e a serialização JSON (ga_columnar.dumps)
         return {
             "metrics": metrics,
             "dimensions": dims_used,
@@ -295,8 +513,9 @@ class GA4Service:
             "end_date": end_date,
             "limit": limit,
             "offset": offset,
-            "row_count": len(results),
-            "rows": results,
+            "row_count": table.num_rows,
+            "total_rows": total_rows,
+            "rows": table,
         }
 
     def run_preset_report(
@@ -319,48 +538,25 @@ class GA4Service:
             offset=offset,
         )
 
-    def engagement_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int):
-        result = self.run_report(metrics, dimensions, start_date, end_date, limit, offset)
-        self._upsert_rows(GAEngagement, ["device_category","country"], result["rows"], start_date, end_date)
-        return result
+    def engagement_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None):
+        return self._report("engagement", metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard)
 
-    def events_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int):
-        result = self.run_report(metrics, dimensions, start_date, end_date, limit, offset)
-        self._upsert_rows(GAEvents, ["event_name","page_path"], result["rows"], start_date, end_date)
-        return result
+    def events_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None):
+        return self._report("events", metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard)
 
-    def users_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int):
-        result = self.run_report(metrics, dimensions, start_date, end_date, limit, offset)
-        self._upsert_rows(GAUsers, ["country","device_category"], result["rows"], start_date, end_date)
-        return result
+    def users_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None):
+        return self._report("users", metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard)
 
-    def content_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int):
-        result = self.run_report(metrics, dimensions, start_date, end_date, limit, offset)
-        self._upsert_rows(GAContent, ["page_title","page_path"], result["rows"], start_date, end_date)
-        return result
+    def content_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None):
+        return self._report("content", metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard)
 
-    def promotions_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int):
-        result = self.run_report(metrics, dimensions, start_date, end_date, limit, offset)
-        self._upsert_rows(GAPromotions, ["session_default_channel_group"], result["rows"], start_date, end_date)
-        return result
+    def promotions_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None):
+        return self._report("promotions", metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard)
 
-    def ecommerce_items_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int):
-        allowed_dims = ["date","itemId","itemName","itemCategory"]
-        allowed_metrics = ["itemsPurchased","itemsViewed","itemViewEvents","itemsAddedToCart","itemsCheckedOut","itemRevenue","itemDiscountAmount","grossItemRevenue"]
-        self._validate_subset(dimensions, allowed_dims, "dimensões")
-        self._validate_subset(metrics, allowed_metrics, "métricas")
-        combined: Dict[Tuple, Dict] = {}
-        for chunk in self._chunked(metrics, 10):
-            part = self.run_report(chunk, dimensions, start_date, end_date, limit, offset)
-            rows = part.get("rows") or []
-            for r in rows:
-                key = tuple(r.get(d) for d in dimensions)
-                if key not in combined:
-                    combined[key] = {d: r.get(d) for d in dimensions}
-                for mk in chunk:
-                    combined[key][mk] = r.get(mk)
-            self._upsert_rows(GAEcommerce, ["item_id","item_name","item_category"], rows, start_date, end_date)
-        merged_rows = list(combined.values())
+    def ecommerce_items_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None):
+        spec = self.REPORTS["ecommerce_items"]
+        self._validate(metrics, dimensions)
+        merged_rows = self._run_chunked(spec, metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard)
         return {
             "metrics": metrics,
             "dimensions": dimensions,
@@ -368,27 +564,15 @@ class GA4Service:
             "end_date": end_date,
             "limit": limit,
             "offset": offset,
-            "row_count": len(merged_rows),
+            "row_count": merged_rows.num_rows,
+            "persisted": self._persists(spec, dimensions),
             "rows": merged_rows,
         }
 
-    def ecommerce_revenue_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int):
-        allowed_dims = ["date","sessionDefaultChannelGroup"]
-        allowed_metrics = ["ecommercePurchases","purchaseRevenue","grossPurchaseRevenue","totalRevenue","transactions","transactionsPerPurchaser","averagePurchaseRevenue","averagePurchaseRevenuePerPayingUser","averagePurchaseRevenuePerUser","averageRevenuePerUser","purchaserRate","firstTimePurchasers","firstTimePurchaserRate","firstTimePurchasersPerNewUser"]
-        self._validate_subset(dimensions, allowed_dims, "dimensões")
-        self._validate_subset(metrics, allowed_metrics, "métricas")
-        combined: Dict[Tuple, Dict] = {}
-        for chunk in self._chunked(metrics, 10):
-            part = self.run_report(chunk, dimensions, start_date, end_date, limit, offset)
-            rows = part.get("rows") or []
-            for r in rows:
-                key = tuple(r.get(d) for d in dimensions)
-                if key not in combined:
-                    combined[key] = {d: r.get(d) for d in dimensions}
-                for mk in chunk:
-                    combined[key][mk] = r.get(mk)
-            self._upsert_rows(GAEcommerce, ["session_default_channel_group"], rows, start_date, end_date)
-        merged_rows = list(combined.values())
+    def ecommerce_revenue_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None):
+        spec = self.REPORTS["ecommerce_revenue"]
+        self._validate(metrics, dimensions)
+        merged_rows = self._run_chunked(spec, metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard)
         return {
             "metrics": metrics,
             "dimensions": dimensions,
@@ -396,36 +580,18 @@ class GA4Service:
             "end_date": end_date,
             "limit": limit,
             "offset": offset,
-            "row_count": len(merged_rows),
+            "row_count": merged_rows.num_rows,
+            "persisted": self._persists(spec, dimensions),
             "rows": merged_rows,
         }
 
-    def ecommerce_funnel_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int):
-        allowed_dims = ["date","sessionDefaultChannelGroup"]
-        allowed_metrics = ["addToCarts","checkouts","ecommercePurchases","cartToViewRate","purchaseToViewRate"]
-        self._validate_subset(dimensions, allowed_dims, "dimensões")
-        self._validate_subset(metrics, allowed_metrics, "métricas")
-        result = self.run_report(metrics, dimensions, start_date, end_date, limit, offset)
-        self._upsert_rows(GAEcommerce, ["session_default_channel_group"], result["rows"], start_date, end_date)
-        return result
+    def ecommerce_funnel_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None):
+        return self._report("ecommerce_funnel", metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard)
 
-    def ads_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int):
-        allowed_dims = ["date","campaignName","campaignId"]
-        allowed_metrics = ["advertiserAdClicks","advertiserAdImpressions","advertiserAdCost","advertiserAdCostPerClick"]
-        self._validate_subset(dimensions, allowed_dims, "dimensões")
-        self._validate_subset(metrics, allowed_metrics, "métricas")
-        combined: Dict[Tuple, Dict] = {}
-        for chunk in self._chunked(metrics, 10):
-            part = self.run_report(chunk, dimensions, start_date, end_date, limit, offset)
-            rows = part.get("rows") or []
-            for r in rows:
-                key = tuple(r.get(d) for d in dimensions)
-                if key not in combined:
-                    combined[key] = {d: r.get(d) for d in dimensions}
-                for mk in chunk:
-                    combined[key][mk] = r.get(mk)
-            self._upsert_rows(GAAds, ["campaign_name","campaign_id"], rows, start_date, end_date)
-        merged_rows = list(combined.values())
+    def ads_report(self, metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None):
+        spec = self.REPORTS["ads"]
+        self._validate(metrics, dimensions)
+        merged_rows = self._run_chunked(spec, metrics, dimensions, start_date, end_date, limit, offset, all_rows, shard)
         return {
             "metrics": metrics,
             "dimensions": dimensions,
@@ -433,48 +599,270 @@ class GA4Service:
             "end_date": end_date,
             "limit": limit,
             "offset": offset,
-            "row_count": len(merged_rows),
+            "row_count": merged_rows.num_rows,
+            "persisted": self._persists(spec, dimensions),
             "rows": merged_rows,
         }
 
-def _split_csv(s: str) -> List[str]:
-    return [x.strip() for x in s.split(",") if x.strip()]
-
-def _get_service() -> GA4Service:
-    return GA4Service(property_id=os.getenv("GA4_PROPERTY_ID"))
-
-def engagement_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int):
-    svc = _get_service()
-    return svc.engagement_report(_split_csv(metrics), _split_csv(dimensions), start_date, end_date, limit, offset)
-
-def events_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int):
-    svc = _get_service()
-    return svc.events_report(_split_csv(metrics), _split_csv(dimensions), start_date, end_date, limit, offset)
-
-def users_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int):
-    svc = _get_service()
-    return svc.users_report(_split_csv(metrics), _split_csv(dimensions), start_date, end_date, limit, offset)
-
-def content_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int):
-    svc = _get_service()
-    return svc.content_report(_split_csv(metrics), _split_csv(dimensions), start_date, end_date, limit, offset)
-
-def promotions_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int):
-    svc = _get_service()
-    return svc.promotions_report(_split_csv(metrics), _split_csv(dimensions), start_date, end_date, limit, offset)
+    def _run_chunked(self, spec: Dict[str, Any], metrics: List[str], dimensions: List[str], start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None) -> pa.Table:
+        """
+        Executa os lotes de até MAX_METRICS_PER_REQUEST métricas em paralelo e mescla pela chave de dimensões
+        conforme cada resposta chega; a latência total fica próxima à do lote mais lento.
+        O resultado mesclado é gravado uma única vez, numa só transação.
+        """
+        chunks = list(self._chunked(metrics, self.MAX_METRICS_PER_REQUEST))
+        fetch = lambda chunk: self._fetch(chunk, dimensions, start_date, end_date, limit, offset, all_rows, shard)
+        if len(chunks) == 1 or _in_worker():
+            parts = [fetch(chunk) for chunk in chunks]
+        else:
+            futures = [_submit(fetch, chunk) for chunk in chunks]
+            parts = [fut.result() for fut in as_completed(futures)]
+        # Junta os lotes pela chave de dimensões e grava uma vez, já com as métricas de todos os lotes
+        merged = ga_columnar.merge([p["rows"] for p in parts], parts[0]["dimensions"])
+        if self._persists(spec, dimensions):
+            self._upsert_rows(spec["model"], merged, start_date, end_date)
+        return merged
+
+    def _resolve_batch_spec(self, i: int, spec: Dict[str, Any], start_date: str, end_date: str) -> Dict[str, Any]:
+        name = spec.get("report") or spec.get("preset")
+        report = self.REPORTS.get(name or "")
+        if not report:
+            raise ValueError(f"relatório {i} inválido: {name}. Disponíveis: {list(self.REPORTS)}")
+        defaults = report.get("defaults") or self.PRESETS[name]
+        metrics = spec.get("metrics") or defaults["metrics"]
+        dimensions = spec.get("dimensions") or defaults["dimensions"]
+        if isinstance(metrics, str):
+            metrics = _split_csv(metrics)
+        if isinstance(dimensions, str):
+            dimensions = _split_csv(dimensions)
+        self._validate(metrics, dimensions)
+        return {
+            "id": spec.get("id") or f"{i}:{name}",
+            "report": name,
+            "metrics": metrics,
+            "dimensions": dimensions,
+            "start_date": spec.get("start_date") or start_date,
+            "end_date": spec.get("end_date") or end_date,
+            "limit": int(spec.get("limit") or 1000),
+            "offset": int(spec.get("offset") or 0),
+        }
 
-def ecommerce_items_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int):
-    svc = _get_service()
-    return svc.ecommerce_items_report(_split_csv(metrics), _split_csv(dimensions), start_date, end_date, limit, offset)
+    def _run_batch(self, requests: List[RunReportRequest]):
+        batch = BatchRunReportsRequest(property=f"properties/{self.property_id}", requests=requests)
+        with tracer.start_as_current_span("ga.batch_run_reports") as span:
+            span.set_attribute("ga.property_id", self.property_id)
+            span.set_attribute("ga.report_count", len(requests))
+            span.set_attribute("ga.lane", ga_scheduler.current_lane())
+            quota.gate("ga")
+            with ga_scheduler.slot(self.property_id):
+                reports = list(self.client.batch_run_reports(batch).reports)
+        for response in reports:
+            self._charge_quota(response)
+        return reports
+
+    def batch_report(self, specs: List[Dict[str, Any]], start_date: str, end_date: str):
+        if not self.property_id:
+            raise ValueError("GA4_PROPERTY_ID ausente no ambiente")
+        if not specs:
+            raise ValueError("informe ao menos um relatório")
+        resolved = [self._resolve_batch_spec(i, sp, start_date, end_date) for i, sp in enumerate(specs)]
+        # Cada relatório vira uma ou mais sub-requisições (lotes de 10 métricas)
+        subrequests: List[Tuple[int, List[str], RunReportRequest]] = []
+        for idx, r in enumerate(resolved):
+            for chunk in self._chunked(r["metrics"], self.MAX_METRICS_PER_REQUEST):
+                req = self._build_request(chunk, r["dimensions"], r["start_date"], r["end_date"], r["limit"], r["offset"])
+                subrequests.append((idx, chunk, req))
+        groups = list(self._chunked(subrequests, self.MAX_REPORTS_PER_BATCH))
+        if len(groups) == 1 or _in_worker():
+            responses = (self._run_batch([req for _, _, req in g]) for g in groups)
+        else:
+            futures = [_submit(self._run_batch, [req for _, _, req in g]) for g in groups]
+            responses = (f.result() for f in futures)
+
+        parts: List[List[pa.Table]] = [[] for _ in resolved]
+        for group, reports in zip(groups, responses):
+            for (idx, chunk, _), response in zip(group, reports):
+                parts[idx].append(ga_columnar.decode(response, chunk, resolved[idx]["dimensions"]))
+
+        results = []
+        for idx, r in enumerate(resolved):
+            merged_rows = ga_columnar.merge(parts[idx], r["dimensions"])
+            report = self.REPORTS[r["report"]]
+            persisted = self._persists(report, r["dimensions"])
+            if persisted:
+                self._upsert_rows(report["model"], merged_rows, r["start_date"], r["end_date"])
+            results.append({
+                "id": r["id"],
+                "report": r["report"],
+                "metrics": r["metrics"],
+                "dimensions": r["dimensions"],
+                "start_date": r["start_date"],
+                "end_date": r["end_date"],
+                "limit": r["limit"],
+                "offset": r["offset"],
+                "row_count": merged_rows.num_rows,
+                "persisted": persisted,
+                "rows": merged_rows,
+            })
+        return {"rpc_count": len(groups), "reports": results}
 
-def ecommerce_revenue_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int):
-    svc = _get_service()
-    return svc.ecommerce_revenue_report(_split_csv(metrics), _split_csv(dimensions), start_date, end_date, limit, offset)
+def _split_csv(s: str) -> List[str]:
+    return [x.strip() for x in s.split(",") if x.strip()]
 
-def ecommerce_funnel_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int):
-    svc = _get_service()
-    return svc.ecommerce_funnel_report(_split_csv(metrics), _split_csv(dimensions), start_date, end_date, limit, offset)
+def _resolve_date(value: str) -> _date:
+    # Aceita YYYY-MM-DD e as formas relativas da Data API (today, yesterday, NdaysAgo)
+    v = value.strip()
+    if v == "today":
+        return _date.today()
+    if v == "yesterday":
+        return _date.today() - timedelta(days=1)
+    if v.endswith("daysAgo") and v[:-7].isdigit():
+        return _date.today() - timedelta(days=int(v[:-7]))
+    return _date.fromisoformat(v)
+
+SHARDS = ("week", "month")
+
+def _date_shards(start_date: str, end_date: str, shard: str) -> List[Tuple[str, str]]:
+    """Fatias [início, fim] consecutivas alinhadas à semana ISO (segunda a domingo) ou ao mês."""
+    if shard not in SHARDS:
+        raise ValueError(f"shard inválido: {shard}. Use {list(SHARDS)}")
+    start, end = _resolve_date(start_date), _resolve_date(end_date)
+    if start > end:
+        raise ValueError("start_date maior que end_date")
+    out = []
+    cur = start
+    while cur <= end:
+        if shard == "week":
+            nxt = cur + timedelta(days=7 - cur.weekday())
+        else:
+            nxt = (cur.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(nxt - timedelta(days=1), end)
+        out.append((cur.isoformat(), last.isoformat()))
+        cur = nxt
+    return out
+
+_worker_state = threading.local()
+
+def _mark_worker():
+    _worker_state.active = True
+
+def _in_worker() -> bool:
+    # Tarefas já dentro do executor rodam sub-tarefas inline para não esgotar o pool esperando por ele mesmo
+    return getattr(_worker_state, "active", False)
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("GA_MAX_CONCURRENCY") or 4), thread_name_prefix="ga", initializer=_mark_worker)
+# Fan-out por property em pool próprio: cada property espera pelas suas páginas/lotes/fatias no `_executor`
+# sem ocupar um worker dele (nem serializar o trabalho interno)
+_property_executor = ThreadPoolExecutor(max_workers=int(os.getenv("GA_PROPERTY_CONCURRENCY") or 4), thread_name_prefix="ga-prop")
+# Sync e backfill rodam num pool à parte (marcado como worker: páginas e lotes deles rodam inline), assim
+# tarefas de fundo esperando cota nunca ocupam nem enfileiram à frente do trabalho interativo no `_executor`
+_background_executor = ThreadPoolExecutor(max_workers=int(os.getenv("GA_BACKGROUND_CONCURRENCY") or 2), thread_name_prefix="ga-bg", initializer=_mark_worker)
+
+def _submit(fn, *args, executor: Optional[ThreadPoolExecutor] = None):
+    # Leva o contexto da requisição (usuário da cota, trace, profiling) para a thread do executor
+    ctx = contextvars.copy_context()
+    return (executor or _executor).submit(ctx.run, _track_thread(fn), *args)
+
+_services: Dict[str, GA4Service] = {}
+_services_lock = threading.Lock()
+
+def _normalize_property(property_id: str) -> str:
+    pid = property_id.strip()
+    return pid[len("properties/"):] if pid.startswith("properties/") else pid
+
+def configured_properties() -> List[str]:
+    """Properties configuradas: GA4_PROPERTY_IDS (separadas por vírgula) ou, na falta, GA4_PROPERTY_ID."""
+    ids = _split_csv(os.getenv("GA4_PROPERTY_IDS") or "") or _split_csv(os.getenv("GA4_PROPERTY_ID") or "")
+    return list(dict.fromkeys(_normalize_property(p) for p in ids))
+
+def _property_list(properties: Optional[str]) -> List[str]:
+    # None: property padrão; "all": todas as configuradas; senão a lista informada
+    if not properties:
+        ids = configured_properties()[:1]
+    elif properties.strip() == "all":
+        ids = configured_properties()
+    else:
+        ids = list(dict.fromkeys(_normalize_property(p) for p in _split_csv(properties)))
+    if not ids:
+        raise ValueError("GA4_PROPERTY_ID ausente no ambiente")
+    return ids
+
+def _get_service(property_id: Optional[str] = None) -> GA4Service:
+    # Uma instância por property, reaproveitada entre requisições
+    pid = property_id or next(iter(configured_properties()), None)
+    svc = _services.get(pid)
+    if svc is None:
+        with _services_lock:
+            svc = _services.setdefault(pid, GA4Service(property_id=pid))
+    return svc
+
+def _for_properties(properties: Optional[str], call: Callable[[GA4Service], dict]):
+    """
+    Executa `call` para cada property pedida. Com uma só, devolve o resultado como antes; com várias, busca
+    em paralelo (cada uma no seu agendador de cota) e devolve {"properties": [...]}, com o erro de cada
+    property no próprio item em vez de falhar a requisição inteira.
+    """
+    ids = _property_list(properties)
+    if len(ids) == 1:
+        return call(_get_service(ids[0]))
+    futures = [(pid, _submit(call, _get_service(pid), executor=_property_executor)) for pid in ids]
+    out = []
+    for pid, f in futures:
+        try:
+            out.append(dict(f.result(), property_id=pid))
+        except Exception as e:
+            out.append({"property_id": pid, "error": getattr(e, "detail", None) or str(e)})
+    return {"properties": out}
+
+def engagement_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None, properties: Optional[str] = None):
+    m, d = _split_csv(metrics), _split_csv(dimensions)
+    return _for_properties(properties, lambda svc: svc.engagement_report(m, d, start_date, end_date, limit, offset, all_rows, shard))
+
+def events_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None, properties: Optional[str] = None):
+    m, d = _split_csv(metrics), _split_csv(dimensions)
+    return _for_properties(properties, lambda svc: svc.events_report(m, d, start_date, end_date, limit, offset, all_rows, shard))
+
+def users_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None, properties: Optional[str] = None):
+    m, d = _split_csv(metrics), _split_csv(dimensions)
+    return _for_properties(properties, lambda svc: svc.users_report(m, d, start_date, end_date, limit, offset, all_rows, shard))
+
+def content_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None, properties: Optional[str] = None):
+    m, d = _split_csv(metrics), _split_csv(dimensions)
+    return _for_properties(properties, lambda svc: svc.content_report(m, d, start_date, end_date, limit, offset, all_rows, shard))
+
+def promotions_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None, properties: Optional[str] = None):
+    m, d = _split_csv(metrics), _split_csv(dimensions)
+    return _for_properties(properties, lambda svc: svc.promotions_report(m, d, start_date, end_date, limit, offset, all_rows, shard))
+
+def ecommerce_items_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None, properties: Optional[str] = None):
+    m, d = _split_csv(metrics), _split_csv(dimensions)
+    return _for_properties(properties, lambda svc: svc.ecommerce_items_report(m, d, start_date, end_date, limit, offset, all_rows, shard))
+
+def ecommerce_revenue_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None, properties: Optional[str] = None):
+    m, d = _split_csv(metrics), _split_csv(dimensions)
+    return _for_properties(properties, lambda svc: svc.ecommerce_revenue_report(m, d, start_date, end_date, limit, offset, all_rows, shard))
+
+def ecommerce_funnel_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None, properties: Optional[str] = None):
+    m, d = _split_csv(metrics), _split_csv(dimensions)
+    return _for_properties(properties, lambda svc: svc.ecommerce_funnel_report(m, d, start_date, end_date, limit, offset, all_rows, shard))
+
+def ads_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int, all_rows: bool = False, shard: Optional[str] = None, properties: Optional[str] = None):
+    m, d = _split_csv(metrics), _split_csv(dimensions)
+    return _for_properties(properties, lambda svc: svc.ads_report(m, d, start_date, end_date, limit, offset, all_rows, shard))
+
+def batch_report(reports: List[Dict[str, Any]], start_date: str, end_date: str, properties: Optional[str] = None):
+    return _for_properties(properties, lambda svc: svc.batch_report(reports, start_date, end_date))
+
+def warm_up():
+    _client_pool.warm()
+    for pid in configured_properties() or [None]:
+        _get_service(pid)
+        if pid:
+            try:
+                ga_metadata.metadata(_client_pool.get(), pid)
+            except Exception as e:
+                print(f"Metadata GA ({pid}) não carregada no warm-up: {e}")
 
-def ads_report(metrics: str, dimensions: str, start_date: str, end_date: str, limit: int, offset: int):
-    svc = _get_service()
-    return svc.ads_report(_split_csv(metrics), _split_csv(dimensions), start_date, end_date, limit, offset)
+def describe_metadata(property_id: Optional[str] = None) -> dict:
+    ids = _property_list(property_id)
+    return {"properties": [ga_metadata.describe(_client_pool.get(), pid) for pid in ids]}
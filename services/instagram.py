@@ -3,20 +3,36 @@ import requests
 from datetime import datetime, timezone, timedelta
 from fastapi import HTTPException
 from core.db import get_session
+from core.tracing import tracer
+from core.pagination import keyset_page
+from core import quota, resilience
+from services.summary import schedule_refresh
 from models.models_instagram import InsightsProfile, InsightsPost, OAuthToken
 
-def _active_token() -> str:
+_token_cache: dict = {"access_token": None, "expires_at": None}
+
+def _load_token():
     s = get_session()
     obj = s.get(OAuthToken, "meta")
     s.close()
-    if not obj:
-        raise HTTPException(status_code=401, detail={"error":"token ausente"})
+    if obj:
+        _token_cache["access_token"] = obj.access_token
+        _token_cache["expires_at"] = obj.expires_at
+    return obj
+
+def _active_token() -> str:
+    if not _token_cache["access_token"]:
+        if not _load_token():
+            raise HTTPException(status_code=401, detail={"error":"token ausente"})
     now = datetime.now(timezone.utc)
-    if obj.expires_at <= now:
-        raise HTTPException(status_code=401, detail={"error":"token expirado"})
-    return obj.access_token
+    if _token_cache["expires_at"] <= now:
+        # outro worker pode ter renovado o token; relê do banco antes de recusar
+        _load_token()
+        if _token_cache["expires_at"] <= now:
+            raise HTTPException(status_code=401, detail={"error":"token expirado"})
+    return _token_cache["access_token"]
 
-def _graph_get(path: str, extra_params: dict):
+def _graph_get(path: str, extra_params: dict, hedge: bool = False):
     base = os.environ.get("META_GRAPH_BASE") or "https://graph.facebook.com/v24.0"
     token = _active_token()
     params = {"access_token": token}
@@ -24,7 +40,14 @@ def _graph_get(path: str, extra_params: dict):
         if v is not None:
             params[k] = v
     url = base.rstrip("/") + "/" + path.lstrip("/")
-    r = requests.get(url, params=params, timeout=60)
+    with tracer.start_as_current_span("meta.graph_get") as span:
+        span.set_attribute("http.url", url)
+        # cada tentativa enviada (inclusive a hedge) conta na cota do usuário
+        r = resilience.get("meta", url, params=params, hedge=hedge, on_attempt=lambda: quota.charge("meta", 1))
+        span.set_attribute("http.status_code", r.status_code)
+        span.set_attribute("upstream.stale", bool(getattr(r, "stale", False)))
+    if not getattr(r, "stale", False):
+        quota.record_meta_usage(r.headers)
     if r.status_code >= 400:
         try:
             detail = r.json()
@@ -32,9 +55,13 @@ def _graph_get(path: str, extra_params: dict):
             detail = {"error": r.text, "status": r.status_code}
         raise HTTPException(status_code=r.status_code, detail=detail)
     try:
-        return r.json()
+        data = r.json()
     except Exception:
-        return {"raw": r.text}
+        data = {"raw": r.text}
+    if getattr(r, "stale", False) and isinstance(data, dict):
+        # servido do cache enquanto a Graph API está instável
+        data = dict(data, _stale_at=datetime.fromtimestamp(r.cached_at, timezone.utc).isoformat())
+    return data
 
 def _env_ig_id() -> str:
     iid = os.environ.get("IG_ACCOUNT_ID")
@@ -98,6 +125,7 @@ def _persist_monthly_insights(payload: dict, ig_account_id: int, year: int, mont
         s.add(obj)
         s.commit()
         s.close()
+        schedule_refresh()
         return True, None
     except Exception as e:
         try:
@@ -205,7 +233,7 @@ def _persist_post_insights(media: dict, insights: dict) -> tuple[bool, str | Non
 
 def media_list(fields: str, limit: int, media_type: str | None, since: int | str | None, until: int | str | None):
     params = {"fields": fields, "limit": limit}
-    res = _graph_get(f"{_env_ig_id()}/media", params)
+    res = _graph_get(f"{_env_ig_id()}/media", params, hedge=True)
     types = None
     if media_type:
         types = {t.strip().upper() for t in media_type.split(",") if t.strip()}
@@ -259,8 +287,48 @@ def media_list(fields: str, limit: int, media_type: str | None, since: int | str
         pass
     return res
 
+def _ts_to_datetime(v: int | str | None, what: str):
+    if v is None:
+        return None
+    if isinstance(v, int):
+        return datetime.fromtimestamp(v, tz=timezone.utc)
+    s = str(v).strip()
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except Exception:
+        try:
+            return datetime.fromtimestamp(int(s), tz=timezone.utc)
+        except Exception:
+            raise HTTPException(status_code=400, detail={"error":f"{what} deve ser YYYY-MM-DD ou timestamp unix"})
+
+def stored_media(media_type: str | None, since: int | str | None, until: int | str | None, order: str, limit: int, cursor: str | None):
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail={"error":"order inválido; use 'asc' ou 'desc'"})
+    s_dt = _ts_to_datetime(since, "since")
+    u_dt = _ts_to_datetime(until, "until")
+    s = get_session()
+    try:
+        q = s.query(InsightsPost)
+        if media_type:
+            types = [t.strip().upper() for t in media_type.split(",") if t.strip()]
+            q = q.filter(InsightsPost.media_type.in_(types))
+        if s_dt:
+            q = q.filter(InsightsPost.timestamp >= s_dt)
+        if u_dt:
+            q = q.filter(InsightsPost.timestamp <= u_dt)
+        exprs = [InsightsPost.timestamp, InsightsPost.media_id]
+        try:
+            rows, next_cursor = keyset_page(q, exprs, cursor, limit, key=lambda o: (o.timestamp, o.media_id), descending=order == "desc")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail={"error":str(e)})
+        cols = [c.name for c in InsightsPost.__table__.columns]
+        data = [{c: getattr(o, c) for c in cols} for o in rows]
+        return {"data": data, "next_cursor": next_cursor}
+    finally:
+        s.close()
+
 def get_profile(fields: str):
-    return _graph_get(f"{_env_ig_id()}", {"fields": fields})
+    return _graph_get(f"{_env_ig_id()}", {"fields": fields}, hedge=True)
 
 def _validate_insights_params(metrics: list[str], period: str | None, timeframe: str | None, metric_type: str | None, breakdown: str | None):
     allowed_metrics = {
@@ -506,4 +574,9 @@ def exchange_token_service(fb_exchange_token: str):
     s.add(obj)
     s.commit()
     s.close()
+    _token_cache["access_token"] = access_token
+    _token_cache["expires_at"] = expires_at
     return {"access_token": access_token, "expires_in": int(expires_in)}
+
+def warm_up():
+    _load_token()
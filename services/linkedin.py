@@ -1,4 +1,5 @@
 import os
+from core.tracing import inject_env, tracer
 
 def start_linkedin_bot(segments: str | None = None):
     import subprocess, sys
@@ -11,5 +12,9 @@ def start_linkedin_bot(segments: str | None = None):
     env["DB_NAME"] = env.get("POSTGRES_DB") or env.get("DB_NAME") or "postgres"
     env["DB_USER"] = env.get("POSTGRES_USER") or env.get("DB_USER") or "postgres"
     env["DB_PASSWORD"] = env.get("POSTGRES_PASSWORD") or env.get("DB_PASSWORD") or ""
-    p = subprocess.Popen(args, env=env)
+    with tracer.start_as_current_span("linkedin.bot.start") as span:
+        span.set_attribute("linkedin.segments", env["DEFAULT_SEGMENTS"])
+        inject_env(env)
+        p = subprocess.Popen(args, env=env)
+        span.set_attribute("process.pid", p.pid)
     return {"pid": p.pid, "started": True}
@@ -1,6 +1,6 @@
 import os
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, Optional
 
 import requests
@@ -12,9 +12,14 @@ from models.models_rd_station import (
     RDConversionAnalytics,
     RDSegmentation,
     RDLandingPage,
-    RDWorkflow
+    RDWorkflow,
+    SEND_AT_KEY,
 )
 from core.db import get_session, engine
+from core import resilience
+from core.tracing import traced
+from core.pagination import keyset_page
+from services.summary import schedule_refresh
 
 RD_TOKEN_URL = "https://api.rd.services/auth/token"
 RD_API_BASE = "https://api.rd.services/platform"
@@ -99,6 +104,15 @@ def get_access_token() -> str:
     raise HTTPException(status_code=401, detail="RD Station não autenticado. Faça o OAuth em /rd/auth.")
 
 
+def warm_up():
+    try:
+        get_access_token()
+    except HTTPException:
+        # ainda sem OAuth concluído; nada a aquecer
+        pass
+
+
+@traced("rd.exchange_code_for_access_token")
 def exchange_code_for_access_token(code: str, redirect_uri: str) -> Dict[str, Any]:
     client_id = _env("RD_ACCOUNT_ID")
     client_secret = _env("RD_CLIENT_SECRET")
@@ -138,20 +152,30 @@ def _headers() -> Dict[str, str]:
     return {"Authorization": f"Bearer {get_access_token()}", "Content-Type": "application/json"}
 
 
+def _rd_get(path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    headers = {"Authorization": f"Bearer {get_access_token()}", "accept": "application/json"}
+    res = resilience.get("rd", f"{RD_API_BASE}{path}", params=params, headers=headers)
+    if res.status_code >= 400:
+        try:
+            detail = res.json()
+        except Exception:
+            detail = {"error": res.text, "status": res.status_code}
+        raise HTTPException(status_code=res.status_code, detail=detail)
+    data = res.json()
+    if getattr(res, "stale", False) and isinstance(data, dict):
+        # servido do cache enquanto o RD está instável
+        data = dict(data, _stale_at=datetime.fromtimestamp(res.cached_at, timezone.utc).isoformat())
+    return data
+
+
+@traced("rd.get_email_analytics")
 def get_email_analytics(start_date: str, end_date: str) -> Dict[str, Any]:
     """
     Busca estatísticas de e-mail marketing (aberturas, cliques, envios).
     Corresponde aos dados das Imagens 1 e 3.
     """
-    token = get_access_token()
-    url = f"{RD_API_BASE}/analytics/emails"
-    headers = {"Authorization": f"Bearer {token}", "accept": "application/json"}
     params = {"start_date": start_date, "end_date": end_date}
-    res = requests.get(url, headers=headers, params=params, timeout=30)
-    if res.status_code >= 400:
-        raise HTTPException(status_code=res.status_code, detail=res.json())
-    
-    data = res.json()
+    data = _rd_get("/analytics/emails", params)
     
     # Persistir dados no banco
     db: Session = get_session()
@@ -180,6 +204,7 @@ def get_email_analytics(start_date: str, end_date: str) -> Dict[str, Any]:
             email_record.contacts_count = item.get("contacts_count")
             
         db.commit()
+        schedule_refresh()
     except Exception as e:
         db.rollback()
         print(f"Erro ao persistir analytics de e-mail: {e}")
@@ -189,20 +214,14 @@ def get_email_analytics(start_date: str, end_date: str) -> Dict[str, Any]:
     return data
 
 
+@traced("rd.get_conversions_analytics")
 def get_conversions_analytics(start_date: str, end_date: str) -> Dict[str, Any]:
     """
     Busca estatísticas de conversões/leads.
     Corresponde aos dados da Imagem 2.
     """
-    token = get_access_token()
-    url = f"{RD_API_BASE}/analytics/conversions"
-    headers = {"Authorization": f"Bearer {token}", "accept": "application/json"}
     params = {"start_date": start_date, "end_date": end_date}
-    res = requests.get(url, headers=headers, params=params, timeout=30)
-    if res.status_code >= 400:
-        raise HTTPException(status_code=res.status_code, detail=res.json())
-    
-    data = res.json()
+    data = _rd_get("/analytics/conversions", params)
     
     # Persistir dados no banco
     db: Session = get_session()
@@ -224,6 +243,7 @@ def get_conversions_analytics(start_date: str, end_date: str) -> Dict[str, Any]:
             conv_record.conversion_rate = item.get("conversion_rate")
             
         db.commit()
+        schedule_refresh()
     except Exception as e:
         db.rollback()
         print(f"Erro ao persistir analytics de conversão: {e}")
@@ -233,18 +253,12 @@ def get_conversions_analytics(start_date: str, end_date: str) -> Dict[str, Any]:
     return data
 
 
+@traced("rd.get_segmentations")
 def get_segmentations() -> Dict[str, Any]:
     """
     Lista todas as segmentações de contatos.
     """
-    token = get_access_token()
-    url = f"{RD_API_BASE}/segmentations"
-    headers = {"Authorization": f"Bearer {token}", "accept": "application/json"}
-    res = requests.get(url, headers=headers, timeout=30)
-    if res.status_code >= 400:
-        raise HTTPException(status_code=res.status_code, detail=res.json())
-    
-    data = res.json()
+    data = _rd_get("/segmentations")
     
     # Persistir no banco
     db: Session = get_session()
@@ -271,18 +285,12 @@ def get_segmentations() -> Dict[str, Any]:
     return data
 
 
+@traced("rd.get_landing_pages")
 def get_landing_pages() -> Any:
     """
     Lista as Landing Pages ativas.
     """
-    token = get_access_token()
-    url = f"{RD_API_BASE}/landing_pages"
-    headers = {"Authorization": f"Bearer {token}", "accept": "application/json"}
-    res = requests.get(url, headers=headers, timeout=30)
-    if res.status_code >= 400:
-        raise HTTPException(status_code=res.status_code, detail=res.json())
-    
-    data = res.json()
+    data = _rd_get("/landing_pages")
     
     # Persistir no banco
     db: Session = get_session()
@@ -314,18 +322,12 @@ def get_landing_pages() -> Any:
     return data
 
 
+@traced("rd.get_workflows")
 def get_workflows() -> Dict[str, Any]:
     """
     Lista os fluxos de automação.
     """
-    token = get_access_token()
-    url = f"{RD_API_BASE}/workflows"
-    headers = {"Authorization": f"Bearer {token}", "accept": "application/json"}
-    res = requests.get(url, headers=headers, timeout=30)
-    if res.status_code >= 400:
-        raise HTTPException(status_code=res.status_code, detail=res.json())
-    
-    data = res.json()
+    data = _rd_get("/workflows")
     
     # Persistir no banco
     db: Session = get_session()
@@ -352,3 +354,76 @@ def get_workflows() -> Dict[str, Any]:
         
     return data
 
+
+# Catálogos persistidos: chave de ordenação (única, não nula), coluna de nome, coluna de status e coluna de data
+# Valor usado no lugar de send_at nulo na chave de paginação (keyset exige chave não nula); é o mesmo de SEND_AT_KEY
+_NULL_SEND_AT = datetime(1, 1, 1, tzinfo=timezone.utc)
+
+STORED_CATALOGS = {
+    "segmentations": {"model": RDSegmentation, "key": ["id"], "name": "name", "status": "process_status", "date": "created_at"},
+    "landing_pages": {"model": RDLandingPage, "key": ["id"], "name": "title", "status": "status", "date": "created_at"},
+    "workflows": {"model": RDWorkflow, "key": ["id"], "name": "name", "status": "status", "date": "created_at"},
+    "emails": {"model": RDEmailAnalytics, "key": ["send_at", "campaign_id"], "name": "campaign_name", "status": None, "date": "send_at", "coalesce": {"send_at": (_NULL_SEND_AT, SEND_AT_KEY)}},
+}
+
+
+def _parse_dt(v: Optional[str], what: str) -> Optional[datetime]:
+    if not v:
+        return None
+    try:
+        return datetime.fromisoformat(v.strip().replace("Z", "+00:00"))
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"{what} inválido; use YYYY-MM-DD ou ISO 8601")
+
+
+def stored_catalog(
+    kind: str,
+    name: Optional[str],
+    status: Optional[str],
+    since: Optional[str],
+    until: Optional[str],
+    order: str,
+    limit: int,
+    cursor: Optional[str],
+) -> Dict[str, Any]:
+    """
+    Lê segmentações, landing pages, workflows ou analytics de e-mail já persistidos,
+    com paginação por keyset (sem chamar a API do RD Station).
+    """
+    cat = STORED_CATALOGS.get(kind)
+    if not cat:
+        raise HTTPException(status_code=404, detail=f"catálogo desconhecido: {kind}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order inválido; use 'asc' ou 'desc'")
+    model = cat["model"]
+    since_dt = _parse_dt(since, "since")
+    until_dt = _parse_dt(until, "until")
+    db: Session = get_session()
+    try:
+        q = db.query(model)
+        if name:
+            # % e _ digitados pelo usuário são literais, não curingas
+            pattern = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            q = q.filter(getattr(model, cat["name"]).ilike(f"%{pattern}%", escape="\\"))
+        if status:
+            if not cat["status"]:
+                raise HTTPException(status_code=400, detail=f"{kind} não tem filtro de status")
+            q = q.filter(getattr(model, cat["status"]) == status)
+        if since_dt:
+            q = q.filter(getattr(model, cat["date"]) >= since_dt)
+        if until_dt:
+            q = q.filter(getattr(model, cat["date"]) <= until_dt)
+        fill = cat.get("coalesce") or {}
+        exprs = [fill[k][1] if k in fill else getattr(model, k) for k in cat["key"]]
+        try:
+            rows, next_cursor = keyset_page(
+                q, exprs, cursor, limit,
+                key=lambda o: [fill[k][0] if k in fill and getattr(o, k) is None else getattr(o, k) for k in cat["key"]],
+                descending=order == "desc",
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        cols = [c.name for c in model.__table__.columns]
+        return {kind: [{c: getattr(o, c) for c in cols} for o in rows], "next_cursor": next_cursor}
+    finally:
+        db.close()
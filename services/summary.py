@@ -0,0 +1,220 @@
+import os
+import threading
+from datetime import date as _date
+from typing import Optional
+from sqlalchemy import text
+from core.db import engine
+
+# Visões materializadas do resumo cross-channel. Cada uma tem índice único para permitir
+# REFRESH ... CONCURRENTLY (leituras não bloqueiam e só as linhas alteradas são reescritas).
+VIEWS = [
+    # GA por property: as tabelas de origem vêm em fatias (país × dispositivo). Usuários ativos não são
+    # aditivos entre fatias, então a coluna é explicitamente a soma das fatias, não usuários únicos.
+    # A taxa de engajamento é ponderada por sessões (sessões = engagedSessions / engagementRate).
+    ("reporting.ga_kpi_daily", """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS reporting.ga_kpi_daily AS
+        WITH
+        u AS (
+            SELECT property_id, date, SUM(active_users) AS ga_active_users_slice_sum, SUM(new_users) AS ga_new_users
+            FROM google_analytics.users GROUP BY property_id, date
+        ),
+        e AS (
+            SELECT property_id, date, SUM(engaged_sessions) AS ga_engaged_sessions,
+                   SUM(engaged_sessions / NULLIF(engagement_rate, 0)) AS ga_sessions
+            FROM google_analytics.engagement GROUP BY property_id, date
+        ),
+        k AS (SELECT property_id, date FROM u UNION SELECT property_id, date FROM e)
+        SELECT property_id, date, ga_active_users_slice_sum, ga_new_users, ga_engaged_sessions, ga_sessions,
+               ga_engaged_sessions / NULLIF(ga_sessions, 0) AS ga_engagement_rate
+        FROM k
+        LEFT JOIN u USING (property_id, date)
+        LEFT JOIN e USING (property_id, date)
+    """, "CREATE UNIQUE INDEX IF NOT EXISTS ux_ga_kpi_daily ON reporting.ga_kpi_daily (property_id, date)"),
+    ("reporting.ga_kpi_monthly", """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS reporting.ga_kpi_monthly AS
+        SELECT property_id, date_trunc('month', date)::date AS date,
+               SUM(ga_active_users_slice_sum) AS ga_active_users_slice_sum, SUM(ga_new_users) AS ga_new_users,
+               SUM(ga_engaged_sessions) AS ga_engaged_sessions, SUM(ga_sessions) AS ga_sessions,
+               SUM(ga_engaged_sessions) / NULLIF(SUM(ga_sessions), 0) AS ga_engagement_rate
+        FROM reporting.ga_kpi_daily GROUP BY 1, 2
+    """, "CREATE UNIQUE INDEX IF NOT EXISTS ux_ga_kpi_monthly ON reporting.ga_kpi_monthly (property_id, date)"),
+    ("reporting.kpi_daily", """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS reporting.kpi_daily AS
+        WITH
+        li_upd AS (
+            SELECT date, impressions_total AS li_impressions, clicks_total AS li_clicks,
+                   reactions_total AS li_reactions, comments_total AS li_comments, shares_total AS li_shares,
+                   engagement_rate_total AS li_engagement_rate
+            FROM linkedin.updates
+        ),
+        li_fol AS (
+            SELECT date, total_followers AS li_new_followers FROM linkedin.followers
+        ),
+        li_vis AS (
+            SELECT date, total_page_views_total AS li_page_views, total_unique_visitors_total AS li_unique_visitors
+            FROM linkedin.visitors
+        ),
+        rd_em AS (
+            SELECT (send_at AT TIME ZONE 'UTC')::date AS date, COUNT(*) AS rd_email_campaigns,
+                   SUM(email_delivered_count) AS rd_emails_delivered, SUM(email_opened_count) AS rd_emails_opened,
+                   SUM(email_clicked_count) AS rd_emails_clicked
+            FROM rd_station.email_analytics WHERE send_at IS NOT NULL GROUP BY 1
+        ),
+        days AS (
+            SELECT date FROM li_upd UNION SELECT date FROM li_fol UNION SELECT date FROM li_vis UNION SELECT date FROM rd_em
+        )
+        SELECT date,
+               li_impressions, li_clicks, li_reactions, li_comments, li_shares, li_engagement_rate,
+               li_new_followers, li_page_views, li_unique_visitors,
+               rd_email_campaigns, rd_emails_delivered, rd_emails_opened, rd_emails_clicked
+        FROM days
+        LEFT JOIN li_upd USING (date)
+        LEFT JOIN li_fol USING (date)
+        LEFT JOIN li_vis USING (date)
+        LEFT JOIN rd_em USING (date)
+    """, "CREATE UNIQUE INDEX IF NOT EXISTS ux_kpi_daily_date ON reporting.kpi_daily (date)"),
+    ("reporting.kpi_monthly", """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS reporting.kpi_monthly AS
+        WITH
+        daily AS (
+            SELECT date_trunc('month', date)::date AS month,
+                   SUM(li_impressions) AS li_impressions, SUM(li_clicks) AS li_clicks, SUM(li_reactions) AS li_reactions,
+                   SUM(li_comments) AS li_comments, SUM(li_shares) AS li_shares, AVG(li_engagement_rate) AS li_engagement_rate,
+                   SUM(li_new_followers) AS li_new_followers, SUM(li_page_views) AS li_page_views,
+                   SUM(li_unique_visitors) AS li_unique_visitors,
+                   SUM(rd_email_campaigns) AS rd_email_campaigns, SUM(rd_emails_delivered) AS rd_emails_delivered,
+                   SUM(rd_emails_opened) AS rd_emails_opened, SUM(rd_emails_clicked) AS rd_emails_clicked
+            FROM reporting.kpi_daily GROUP BY 1
+        ),
+        ig AS (
+            SELECT make_date(year, month, 1) AS month, SUM(reach) AS ig_reach, SUM(views) AS ig_views,
+                   SUM(profile_views) AS ig_profile_views, SUM(accounts_engaged) AS ig_accounts_engaged,
+                   SUM(total_interactions) AS ig_total_interactions, SUM(website_clicks) AS ig_website_clicks
+            FROM instagram.insights_profile GROUP BY 1
+        ),
+        months AS (SELECT month FROM daily UNION SELECT month FROM ig)
+        SELECT month AS date,
+               daily.li_impressions, daily.li_clicks, daily.li_reactions, daily.li_comments, daily.li_shares,
+               daily.li_engagement_rate, daily.li_new_followers, daily.li_page_views, daily.li_unique_visitors,
+               daily.rd_email_campaigns, daily.rd_emails_delivered, daily.rd_emails_opened, daily.rd_emails_clicked,
+               ig.ig_reach, ig.ig_views, ig.ig_profile_views, ig.ig_accounts_engaged,
+               ig.ig_total_interactions, ig.ig_website_clicks
+        FROM months
+        LEFT JOIN daily USING (month)
+        LEFT JOIN ig USING (month)
+    """, "CREATE UNIQUE INDEX IF NOT EXISTS ux_kpi_monthly_date ON reporting.kpi_monthly (date)"),
+    ("reporting.kpi_snapshot", """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS reporting.kpi_snapshot AS
+        SELECT 1 AS id,
+               COALESCE(SUM(conversion_count), 0) AS rd_conversions,
+               COALESCE(SUM(visits_count), 0) AS rd_visits,
+               MAX(updated_at) AS rd_conversions_updated_at
+        FROM rd_station.conversion_analytics
+    """, "CREATE UNIQUE INDEX IF NOT EXISTS ux_kpi_snapshot_id ON reporting.kpi_snapshot (id)"),
+]
+
+# Chave do advisory lock que serializa refreshes entre workers/processos
+_REFRESH_LOCK_KEY = 7340021
+# Incrementar ao mudar a definição das visões: as antigas são recriadas na inicialização
+_VIEWS_VERSION = "3"
+
+def ensure_views():
+    """Cria/recria as visões do resumo; chamado na inicialização da API (core.warmup), nunca no import."""
+    names = [name for name, _, _ in VIEWS]
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _REFRESH_LOCK_KEY})
+        versions = conn.execute(
+            text("SELECT n, obj_description(to_regclass(n), 'pg_class') FROM unnest(CAST(:names AS text[])) AS n"),
+            {"names": names},
+        ).all()
+        if all(v == _VIEWS_VERSION for _, v in versions):
+            # visões já na versão atual: nada de DDL
+            return
+        conn.execute(text("CREATE SCHEMA IF NOT EXISTS reporting"))
+        for name, current in versions:
+            if current != _VIEWS_VERSION:
+                conn.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {name} CASCADE"))
+        for name, ddl, idx in VIEWS:
+            conn.execute(text(ddl))
+            conn.execute(text(idx))
+            conn.execute(text(f"COMMENT ON MATERIALIZED VIEW {name} IS '{_VIEWS_VERSION}'"))
+
+def refresh_views() -> bool:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        got = conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": _REFRESH_LOCK_KEY}).scalar()
+        if not got:
+            # outro processo já está atualizando
+            return False
+        try:
+            for name, _, _ in VIEWS:
+                conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _REFRESH_LOCK_KEY})
+    return True
+
+_timer: Optional[threading.Timer] = None
+_timer_lock = threading.Lock()
+
+def _run_scheduled():
+    global _timer
+    with _timer_lock:
+        _timer = None
+    try:
+        refresh_views()
+    except Exception as e:
+        print(f"Erro ao atualizar visões do resumo: {e}")
+
+def schedule_refresh():
+    """Agenda um refresh após SUMMARY_REFRESH_DELAY segundos; syncs em sequência geram um único refresh."""
+    global _timer
+    with _timer_lock:
+        if _timer is not None:
+            return
+        _timer = threading.Timer(float(os.environ.get("SUMMARY_REFRESH_DELAY") or 5), _run_scheduled)
+        _timer.daemon = True
+        _timer.start()
+
+def get_summary(start_date: Optional[str], end_date: Optional[str], granularity: str, property_id: Optional[str] = None):
+    if granularity not in ("day", "month"):
+        raise ValueError("granularity inválida; use 'day' ou 'month'")
+    view = "reporting.kpi_daily" if granularity == "day" else "reporting.kpi_monthly"
+    ga_view = "reporting.ga_kpi_daily" if granularity == "day" else "reporting.ga_kpi_monthly"
+    try:
+        start = _date.fromisoformat(start_date) if start_date else None
+        end = _date.fromisoformat(end_date) if end_date else None
+    except Exception:
+        raise ValueError("datas devem estar em YYYY-MM-DD")
+    if start and granularity == "month":
+        start = start.replace(day=1)
+    where = []
+    params = {}
+    if start:
+        where.append("date >= :start")
+        params["start"] = start
+    if end:
+        where.append("date <= :end")
+        params["end"] = end
+    rows_where = " AND ".join(where) or "true"
+    if property_id:
+        where.append("property_id = :property_id")
+        params["property_id"] = property_id.split("/")[-1]
+    ga_where = " AND ".join(where) or "true"
+    # Uma única ida ao banco: cada visão é lida pelo índice de data e agregada em JSON no próprio Postgres
+    sql = f"""
+        SELECT
+            (SELECT coalesce(json_agg(k ORDER BY k.date), '[]') FROM {view} k WHERE {rows_where}) AS rows,
+            (SELECT coalesce(json_agg(g ORDER BY g.property_id, g.date), '[]') FROM {ga_view} g WHERE {ga_where}) AS ga,
+            (SELECT json_build_object('rd_conversions', s.rd_conversions, 'rd_visits', s.rd_visits,
+                                      'rd_conversions_updated_at', s.rd_conversions_updated_at)
+             FROM reporting.kpi_snapshot s) AS rd_conversions
+    """
+    with engine.connect() as conn:
+        result = conn.execute(text(sql), params).one()
+    return {
+        "granularity": granularity,
+        "start_date": start.isoformat() if start else None,
+        "end_date": end.isoformat() if end else None,
+        "rows": result.rows,
+        "ga": result.ga,
+        "rd_conversions": result.rd_conversions,
+    }